@@ -0,0 +1,18 @@
+# benchmarks
+# Performance benchmarks for the mailstat package
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Sat Jan 04 11:20:13 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: __init__.py [] benjamin@bengfort.com $
+
+"""
+Performance benchmarks for the mailstat package
+
+Run each benchmark as a script from the root of the repository, e.g.:
+
+    $ python -m benchmarks.analysis_bench tests/fixtures/emailmetrics.csv
+"""
@@ -0,0 +1,79 @@
+# benchmarks.analysis_bench
+# Throughput of the Analysis harness as the number of metrics grows
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Sat Jan 04 11:24:51 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: analysis_bench.py [] benjamin@bengfort.com $
+
+"""
+Throughput of the Analysis harness as the number of metrics grows
+
+Compares the per-metric deepcopy of every row that the harness used to do
+with the shared, read-only FrozenRow view that it uses now. The rows are
+read into memory first so that only the dispatch cost is measured.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import sys
+import time
+
+from copy import deepcopy
+from mailstat.reader import M3Reader, FrozenRow
+from mailstat.metric import DomainDistribution
+
+##########################################################################
+## Benchmark
+##########################################################################
+
+def copied(rows, metrics):
+    """
+    The original dispatch: a deepcopy per row, per metric.
+    """
+    for row in rows:
+        for metric in metrics:
+            metric.process(deepcopy(row))
+
+def viewed(rows, metrics):
+    """
+    The current dispatch: one read-only view per row.
+    """
+    for row in rows:
+        row = FrozenRow(row)
+        for metric in metrics:
+            metric.process(row)
+
+def throughput(dispatch, rows, metrics, repeat=3):
+    """
+    Returns the best rows per second of the dispatch over the repeats.
+    """
+    best = 0.0
+    for idx in xrange(repeat):
+        for metric in metrics:
+            metric.preprocess()
+
+        start = time.time()
+        dispatch(rows, metrics)
+        best  = max(best, len(rows) / (time.time() - start))
+    return best
+
+def benchmark(path, max_metrics=8):
+    rows = list(M3Reader(path))
+
+    print "%8s %16s %16s %8s" % ("metrics", "deepcopy rows/s", "view rows/s", "speedup")
+    for count in xrange(1, max_metrics+1):
+        metrics = [DomainDistribution() for idx in xrange(count)]
+        copy    = throughput(copied, rows, metrics)
+        view    = throughput(viewed, rows, metrics)
+
+        print "%8i %16.0f %16.0f %7.1fx" % (count, copy, view, view / copy)
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else "tests/fixtures/emailmetrics.csv"
+    benchmark(path)
@@ -0,0 +1,87 @@
+# benchmarks.compression_bench
+# Throughput of M3Reader on compressed versus uncompressed input
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Wed Jan 08 14:02:31 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: compression_bench.py [] benjamin@bengfort.com $
+
+"""
+Throughput of M3Reader on compressed versus uncompressed input
+
+Writes the body of a CSV file several times over into plain, gzip, bz2
+and (if lzma is available) xz files in a temporary directory, and then
+reads each with M3Reader, both fully munged and with a projection of the
+email field only.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import sys
+import bz2
+import gzip
+import time
+import shutil
+import tempfile
+
+from mailstat.reader import M3Reader, EMAIL, lzma
+
+##########################################################################
+## Benchmark
+##########################################################################
+
+def writers():
+    yield "plain", ".csv", open
+    yield "gzip", ".csv.gz", gzip.open
+    yield "bz2", ".csv.bz2", bz2.BZ2File
+    if lzma is not None:
+        yield "xz", ".csv.xz", lzma.LZMAFile
+
+def replicate(path, tmpdir, repeat):
+    """
+    Writes the header and `repeat` copies of the body in every format.
+    """
+    with open(path, 'rb') as data:
+        header = data.readline()
+        body   = data.read()
+
+    paths = []
+    for name, ext, opener in writers():
+        out = os.path.join(tmpdir, "emails" + ext)
+        fobj = opener(out, 'wb')
+        fobj.write(header)
+        for idx in xrange(repeat):
+            fobj.write(body)
+        fobj.close()
+        paths.append((name, out))
+    return paths
+
+def throughput(path, fields=None):
+    """
+    Returns the rows per second of reading a file with M3Reader.
+    """
+    start = time.time()
+    rows  = sum(1 for row in M3Reader(path, fields=fields))
+    return rows / (time.time() - start)
+
+def benchmark(path, repeat=20):
+    tmpdir = tempfile.mkdtemp(prefix="mailstat-bench-")
+    try:
+        print "%8s %12s %14s %16s" % ("format", "size (KB)", "munged rows/s", "email rows/s")
+        for name, fpath in replicate(path, tmpdir, repeat):
+            size = os.path.getsize(fpath) / 1024.0
+            print "%8s %12.0f %14.0f %16.0f" % (
+                name, size, throughput(fpath), throughput(fpath, (EMAIL,))
+            )
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else "tests/fixtures/emailmetrics.csv"
+    benchmark(path)
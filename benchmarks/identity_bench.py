@@ -0,0 +1,79 @@
+# benchmarks.identity_bench
+# Scaling of the blocking identity resolution on synthetic addresses
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Fri Jan 17 14:26:10 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: identity_bench.py [] benjamin@bengfort.com $
+
+"""
+Scaling of the blocking identity resolution on synthetic addresses
+
+Builds records for people combined from random first and last names, with
+a few addresses each in the common local part styles (first.last, flast,
+lastf) and with and without names, then times adding the records and
+resolving them into clusters at increasing sizes.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import sys
+import time
+import random
+
+from mailstat.metric.identity import IdentityResolution
+from mailstat.utils.testgen import list_from_file
+
+##########################################################################
+## Benchmark
+##########################################################################
+
+STYLES = (
+    lambda f, l: "%s.%s" % (f, l),
+    lambda f, l: "%s%s" % (f[0], l),
+    lambda f, l: "%s%s" % (l, f[0]),
+)
+
+def addresses(names, domains, count, seed=42):
+    """
+    Yields (email, first, last, display) tuples of about `count` addresses.
+    """
+    rng     = random.Random(seed)
+    firsts  = [name.split()[0].lower() for name in names]
+    lasts   = [name.split()[-1].lower() for name in names]
+
+    for person in xrange(count // len(STYLES)):
+        # Double barrelled names make enough distinct last names
+        first = rng.choice(firsts)
+        last  = rng.choice(lasts) + rng.choice(lasts)
+        for style in STYLES:
+            email = "%s@%s" % (style(first, last), rng.choice(domains))
+            if rng.random() < 0.5:
+                yield email, first.title(), last.title(), ""
+            else:
+                yield email, "", "", ""
+
+def benchmark(names, domains, sizes=(10000, 100000, 1000000)):
+    print "%10s %12s %12s %10s" % ("addresses", "add (s)", "resolve (s)", "clusters")
+    for size in sizes:
+        metric = IdentityResolution()
+        metric.preprocess()
+
+        start = time.time()
+        for record in addresses(names, domains, size):
+            metric.add(*record)
+        added = time.time()
+        metric.postprocess()
+        print "%10i %12.2f %12.2f %10i" % (
+            size, added - start, time.time() - added, len(metric.get_value())
+        )
+
+if __name__ == '__main__':
+    names   = list(list_from_file(sys.argv[1] if len(sys.argv) > 1 else "fixtures/names.txt"))
+    domains = list(list_from_file(sys.argv[2] if len(sys.argv) > 2 else "fixtures/domains.txt"))
+    benchmark(names, domains)
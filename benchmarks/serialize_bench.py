@@ -0,0 +1,77 @@
+# benchmarks.serialize_bench
+# Write and load times of the analysis output formats
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Fri Jan 24 10:12:57 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: serialize_bench.py [] benjamin@bengfort.com $
+
+"""
+Write and load times of the analysis output formats
+
+Builds values shaped like a large analysis (a domain distribution with a
+million domains and a top 10 list), then times writing each format with
+its writer and loading it back, as a dashboard would.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import numpy as np
+
+from mailstat.reporting.writers import *
+
+##########################################################################
+## Benchmark
+##########################################################################
+
+def indented(values, path):
+    """
+    The previous output of the console: json.dump with an indent.
+    """
+    with open(path, 'w') as outfile:
+        json.dump(values, outfile, indent=2, default=json_default)
+
+def loaders():
+    yield "json (indent)", "json", indented, lambda data: json.load(data)
+    yield "json", "json", write_json, lambda data: json.load(data)
+    yield "npz", "npz", write_npz, lambda data: dict(np.load(data))
+    if msgpack is not None:
+        yield "msgpack", "msgpack", write_msgpack, lambda data: msgpack.unpack(data, raw=False)
+
+def benchmark(domains=1000000):
+    values = {
+        "Domain Distribution": dict((u"d%i.example.com" % idx, idx % 97) for idx in xrange(domains)),
+        "Most Frequent Correspondents": [
+            {"email": u"user%i@example.com" % idx, "count": 1000 - idx} for idx in xrange(10)
+        ],
+    }
+
+    tmpdir = tempfile.mkdtemp(prefix="mailstat-bench-")
+    try:
+        print "%14s %12s %10s %10s" % ("format", "size (MB)", "write (s)", "load (s)")
+        for name, ext, writer, loader in loaders():
+            path  = os.path.join(tmpdir, "report." + ext)
+            start = time.time()
+            writer(values, path)
+            wrote = time.time()
+            with open(path, 'rb') as data:
+                loader(data)
+            print "%14s %12.1f %10.2f %10.2f" % (
+                name, os.path.getsize(path) / 1048576.0, wrote - start, time.time() - wrote
+            )
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
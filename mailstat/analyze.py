@@ -17,16 +17,76 @@ Analysis module for the email analysis project
 ## Imports
 ##########################################################################
 
-from copy import deepcopy
+from multiprocessing import Pool
+from itertools import chain
 from mailstat.metric import *
 from mailstat.reader import *
+from mailstat.pipeline import *
+from mailstat.checkpoint import *
 from mailstat.exceptions import *
 
 ##########################################################################
 ## Module Constants
 ##########################################################################
 
-METRICS = [DomainDistribution,]
+METRICS = [
+    DomainDistribution, MostFrequentCorrespondents,
+    DistinctCorrespondents, DistinctDomains,
+    DistinctCountries, DistinctDisplayNames,
+    TimeSeries, ActiveCorrespondents, CountQuantiles, DomainHierarchy,
+    GeographicDistribution,
+]
+
+##########################################################################
+## Processing Helpers
+##########################################################################
+
+def process_rows(rows, metrics):
+    """
+    Runs every row through every metric with a shared, read-only view.
+    """
+    for row in rows:
+        row = FrozenRow(row)
+        for metric in metrics:
+            metric.process(row)
+
+def process_batches(batches, metrics):
+    """
+    Runs column oriented batches through the metrics that implement the
+    batch hook, and the rows of each batch through all other metrics.
+    """
+    batched = [metric for metric in metrics if metric.batched]
+    rowwise = [metric for metric in metrics if not metric.batched]
+
+    for batch in batches:
+        for metric in batched:
+            metric.process_batch(batch)
+
+        if rowwise:
+            process_rows(rows_from_columns(batch), rowwise)
+
+def process_range(dataset, metrics, start, end, batch_size=COLUMN_BATCH):
+    """
+    Runs the rows in the byte range [start, end) of the dataset through
+    the metrics, in batches if any of the metrics are batched.
+    """
+    if any(metric.batched for metric in metrics):
+        process_batches(dataset.iter_columns(batch_size, start, end), metrics)
+    else:
+        process_rows(dataset.iter_range(start, end), metrics)
+
+def analyze_shard(args):
+    """
+    Worker function for parallel analysis: runs the metrics over the rows
+    in a single byte range of the dataset and returns them unfinished (not
+    postprocessed) so that they can be merged by the parent process.
+    """
+    dataset, start, end, metrics, batch_size = args
+    for metric in metrics:
+        metric.preprocess()
+
+    process_range(dataset, metrics, start, end, batch_size)
+    return metrics
 
 ##########################################################################
 ## Analysis Harness
@@ -40,6 +100,17 @@ class Analysis(object):
     def __init__(self, csvfile, **kwargs):
         self.csvfile = csvfile
         self.metrics = kwargs.get('metrics', METRICS)
+        self.workers = kwargs.get('workers', 1)
+        self.cache   = kwargs.get('cache', False)
+
+        # Path of the checkpoint file for incremental analysis
+        self.checkpoint = kwargs.get('checkpoint', None)
+
+        # Pipelined reading in a background thread; the batch size is rows
+        # per batch of the pipeline or of the column oriented batches.
+        self.pipeline   = kwargs.get('pipeline', False)
+        self.batch_size = kwargs.get('batch_size', None)
+        self.queue_size = kwargs.get('queue_size', QUEUE_SIZE)
 
     @property
     def metrics(self):
@@ -47,16 +118,51 @@ class Analysis(object):
 
     @metrics.setter
     def metrics(self, metrics):
+        """
+        Metrics are given as classes, or as instances to configure them.
+        """
         self._metrics = []
         for metric in metrics:
-            self._metrics.append(metric())
+            if not isinstance(metric, Metric):
+                metric = metric()
+            self._metrics.append(metric)
+
+    @property
+    def fields(self):
+        """
+        The union of the fields that the metrics read, None if any metric
+        requires every field of the row.
+        """
+        fields = []
+        for metric in self.metrics:
+            if metric.fields is None:
+                return None
+            fields.extend(f for f in metric.fields if f not in fields)
+        return tuple(fields)
+
+    @property
+    def batched(self):
+        """
+        True if any metric implements the batch hook, in which case the
+        dataset is read in column oriented batches.
+        """
+        return any(metric.batched for metric in self.metrics)
 
     @property
     def dataset(self):
         if not hasattr(self, '_dataset'):
-            self._dataset = M3Reader(self.csvfile)
+            self._dataset = M3Reader(self.csvfile, cache=self.cache, fields=self.fields)
         return self._dataset
 
+    @property
+    def columns(self):
+        """
+        Columnar, in-memory view of the dataset (see M3Reader.to_columns)
+        """
+        if not hasattr(self, '_columns'):
+            self._columns = self.dataset.to_columns()
+        return self._columns
+
     def before_analysis(self):
         for metric in self.metrics:
             metric.preprocess()
@@ -65,15 +171,120 @@ class Analysis(object):
         for metric in self.metrics:
             metric.postprocess()
 
+    def check_options(self):
+        """
+        Raises ImproperlyConfigured for combinations of options that the
+        analysis cannot honor, rather than silently ignoring one of them.
+        """
+        if self.checkpoint:
+            # Appended rows are read serially from the raw CSV
+            ignored = [name for name, value in (
+                ('workers', self.workers > 1), ('pipeline', self.pipeline), ('cache', self.cache),
+            ) if value]
+            if ignored:
+                raise ImproperlyConfigured(
+                    "Incremental analysis with a checkpoint does not support %s" % ", ".join(ignored))
+
+        if self.workers > 1:
+            # Cached datasets are memory mapped and do not need to be parsed,
+            # compressed datasets cannot be split into byte range shards.
+            if self.cache:
+                raise ImproperlyConfigured(
+                    "Cached datasets are analyzed serially, use either workers or cache")
+            if self.dataset.compression is not None:
+                raise ImproperlyConfigured(
+                    "Compressed datasets cannot be split for workers, decompress it first")
+
     def analyze(self):
+        self.check_options()
+
+        if self.checkpoint:
+            return self.analyze_incremental()
+
+        if self.workers > 1:
+            return self.analyze_parallel()
+
+        self.before_analysis()
+        if self.batched:
+            batches = self.dataset.iter_columns(self.batch_size or COLUMN_BATCH)
+            if self.pipeline:
+                batches = chain.from_iterable(Pipeline(batches, 1, self.queue_size))
+            process_batches(batches, self.metrics)
+        else:
+            rows = self.dataset
+            if self.pipeline:
+                rows = Pipeline(rows, self.batch_size or BATCH_SIZE, self.queue_size)
+                rows = chain.from_iterable(rows)
+            process_rows(rows, self.metrics)
+        self.after_analysis()
+
+    def analyze_parallel(self):
+        """
+        Splits the dataset into byte range shards and runs a copy of every
+        metric on each shard in a process pool, then merges the results
+        into the metrics on this instance. All metrics must be mergeable.
+        """
+        for metric in self.metrics:
+            if not metric.mergeable:
+                raise ImproperlyConfigured(
+                    "Metric '%s' must implement merge() for parallel analysis"
+                    % metric.get_name())
+
+        # Metrics are sent to the workers before they are preprocessed
+        tasks = [
+            (self.dataset, start, end, self.metrics, self.batch_size or COLUMN_BATCH)
+            for start, end in self.dataset.shards(self.workers)
+        ]
+
+        pool = Pool(self.workers)
+        try:
+            results = pool.map(analyze_shard, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+        self.before_analysis()
+        for shard in results:
+            for metric, other in zip(self.metrics, shard):
+                metric.merge(other)
+        self.after_analysis()
+
+    def analyze_incremental(self):
+        """
+        Restores the metrics from the checkpoint file if it is valid for the
+        dataset, processes only the rows appended since the checkpoint, and
+        then saves the state of the metrics (before postprocessing) and the
+        new offset to the checkpoint.
+        """
+        dataset    = self.dataset
+        start      = dataset.data_offset()
+        end        = complete(dataset.path)
+        checkpoint = Checkpoint.load(self.checkpoint)
+
         self.before_analysis()
-        for row in self.dataset:
+        if checkpoint is not None and checkpoint.is_valid(dataset.path, self.metrics):
             for metric in self.metrics:
-                metric.process(deepcopy(row))
+                metric.set_state(checkpoint.states[metric.get_name()])
+            start = checkpoint.offset
+
+        if start < end:
+            process_range(dataset, self.metrics, start, end, self.batch_size or COLUMN_BATCH)
+
+        states = dict((metric.get_name(), metric.get_state()) for metric in self.metrics)
+        params = dict((metric.get_name(), metric.get_params()) for metric in self.metrics)
+        Checkpoint(dataset.path, end, states, params=params).save(self.checkpoint)
         self.after_analysis()
 
+    def iterserialize(self):
+        """
+        Yields the name and value of every metric in turn, so that writers
+        can stream the results without holding every value at once.
+        """
+        for metric in self.metrics:
+            yield metric.get_name(), metric.get_value()
+
     def serialize(self):
         """
         TODO: Check analysis state
         """
-        return dict((m.get_name(), m.get_value()) for m in self.metrics)
+        return dict(self.iterserialize())
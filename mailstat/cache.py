@@ -0,0 +1,269 @@
+# mailstat.cache
+# Persistent binary cache of parsed CSV data
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Sun Jan 05 10:12:37 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: cache.py [] benjamin@bengfort.com $
+
+"""
+Persistent binary cache of parsed CSV data
+
+The columns produced by M3Reader.to_columns are stored on disk as one
+NumPy .npy file per array, which can be memory mapped on load instead of
+parsing the CSV file again. A cache entry lives in its own directory in
+the cache dir and is keyed by the path, size, mtime and content hash of
+the CSV file that it was built from.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+from mailstat.reader import *
+from mailstat.exceptions import *
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+CACHE_DIR  = os.environ.get('MAILSTAT_CACHE', os.path.join('~', '.mailstat', 'cache'))
+MANIFEST   = "manifest.json"
+CHUNK_SIZE = 1048576
+FORMAT     = 2          # Version of the layout of the cache entries
+
+##########################################################################
+## Helper Functions
+##########################################################################
+
+def content_hash(path, chunk_size=CHUNK_SIZE):
+    """
+    Computes the SHA1 hex digest of the contents of a file in chunks.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as data:
+        for chunk in iter(lambda: data.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+##########################################################################
+## Encoded Strings
+##########################################################################
+
+class EncodedStrings(object):
+    """
+    A read-only array of strings stored as their concatenated UTF-8 bytes
+    and the offsets of each string (one more offset than strings), which
+    unlike fixed width unicode is no larger than the text and can still be
+    memory mapped. Strings are decoded when they are indexed.
+    """
+
+    def __init__(self, data, offsets):
+        self.data    = data
+        self.offsets = offsets
+
+    @classmethod
+    def encode(cls, strings):
+        """
+        Encodes an iterable of unicode strings.
+        """
+        encoded = [string.encode('utf8') for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    def decode(self, idx):
+        return self.data[self.offsets[idx]:self.offsets[idx+1]].tostring().decode('utf8')
+
+    def __getitem__(self, idx):
+        """
+        Integer indices return a string, slices, masks and index arrays an
+        object array in which each distinct string is decoded once.
+        """
+        if isinstance(idx, (int, long, np.integer)):
+            if idx < 0: idx += len(self)
+            return self.decode(idx)
+
+        indices = np.arange(len(self))[idx]
+        unique, inverse = np.unique(indices, return_inverse=True)
+        strings = np.empty(len(unique), dtype=object)
+        for pos, index in enumerate(unique.tolist()):
+            strings[pos] = self.decode(index)
+        return strings[inverse].reshape(indices.shape)
+
+    def tolist(self):
+        return [self.decode(idx) for idx in xrange(len(self))]
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+##########################################################################
+## Column Cache
+##########################################################################
+
+class ColumnCache(object):
+    """
+    On-disk cache of the columnar data for a single CSV file.
+    """
+
+    def __init__(self, path, cachedir=None, **kwargs):
+        """
+        Construct a cache for the CSV file at path.
+
+        Optional Keyword Arguments:
+            verify:   hash the contents of the file on every load (default True)
+            mmap:     memory map the arrays on load (default True)
+            encoding: encoding the file is parsed with (default ISO8859)
+            datefmt:  format the datetimes are parsed with
+        """
+        self.path     = os.path.abspath(path)
+        self.cachedir = os.path.abspath(os.path.expanduser(cachedir or CACHE_DIR))
+        self.verify   = kwargs.get('verify', True)
+        self.mmap     = kwargs.get('mmap', True)
+        self.encoding = kwargs.get('encoding', ENCODING)
+        self.datefmt  = kwargs.get('datefmt', DATEFMT)
+
+    @property
+    def root(self):
+        """
+        The directory of this cache entry, named by the hash of the path and
+        the parsing options, so that each set of options has its own entry
+        """
+        name = "\0".join((self.path, self.encoding, self.datefmt))
+        return os.path.join(self.cachedir, hashlib.sha1(name).hexdigest())
+
+    def key(self, digest=True):
+        """
+        The key that the cache entry must match to be valid. The content
+        hash is only computed if the digest flag is set.
+        """
+        stat = os.stat(self.path)
+        key  = {
+            'path':     self.path,
+            'size':     stat.st_size,
+            'mtime':    stat.st_mtime,
+            'encoding': self.encoding,
+            'datefmt':  self.datefmt,
+            'format':   FORMAT,
+        }
+        if digest:
+            key['sha1'] = content_hash(self.path)
+        return key
+
+    def manifest(self):
+        """
+        Reads the manifest of the cache entry, None if there isn't one.
+        """
+        path = os.path.join(self.root, MANIFEST)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'r') as data:
+            try:
+                return json.load(data)
+            except ValueError:
+                return None
+
+    def is_valid(self):
+        """
+        Checks the cache entry against the current state of the CSV file,
+        the (expensive) content hash is only compared if verify is set.
+        """
+        manifest = self.manifest()
+        if manifest is None:
+            return False
+
+        key    = self.key(digest=False)
+        cached = manifest['key']
+        for name, value in key.iteritems():
+            if cached.get(name) != value:
+                return False
+
+        if self.verify:
+            return cached.get('sha1') == content_hash(self.path)
+        return True
+
+    def load(self):
+        """
+        Returns the cached columns or None if the cache entry is invalid.
+        """
+        if not self.is_valid():
+            return None
+
+        mode    = 'r' if self.mmap else None
+        columns = {}
+        for field, spec in self.manifest()['columns'].iteritems():
+            arrays = dict(
+                (name, np.load(os.path.join(self.root, fname), mmap_mode=mode))
+                for name, fname in spec['files'].iteritems()
+            )
+
+            if spec['kind'] == 'categorical':
+                categories = EncodedStrings(arrays['data'], arrays['offsets'])
+                columns[field] = Categorical(arrays['codes'], categories)
+            else:
+                columns[field] = arrays['values']
+
+        return columns
+
+    def save(self, columns):
+        """
+        Writes the columns to the cache, replacing any existing entry. The
+        entry is written to a temporary directory and then moved in place.
+        """
+        if not os.path.exists(self.cachedir):
+            os.makedirs(self.cachedir)
+
+        tmpdir   = tempfile.mkdtemp(dir=self.cachedir)
+        manifest = {'key': self.key(), 'columns': {}}
+
+        try:
+            for idx, (field, column) in enumerate(columns.iteritems()):
+                if isinstance(column, Categorical):
+                    categories = EncodedStrings.encode(column.categories)
+                    arrays = {
+                        'codes':   column.codes,
+                        'data':    categories.data,
+                        'offsets': categories.offsets,
+                    }
+                    kind = 'categorical'
+                else:
+                    arrays = {'values': column}
+                    kind = 'array'
+
+                files = {}
+                for name, array in arrays.iteritems():
+                    files[name] = "%02i-%s.npy" % (idx, name)
+                    np.save(os.path.join(tmpdir, files[name]), array)
+
+                manifest['columns'][field] = {'kind': kind, 'files': files}
+
+            with open(os.path.join(tmpdir, MANIFEST), 'w') as out:
+                json.dump(manifest, out)
+
+            self.clear()
+            os.rename(tmpdir, self.root)
+        except:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+
+    def clear(self):
+        """
+        Removes the cache entry from disk.
+        """
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
@@ -0,0 +1,129 @@
+# mailstat.checkpoint
+# Checkpoints of metric state for incremental analysis
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Sat Jan 11 13:40:22 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: checkpoint.py [] benjamin@bengfort.com $
+
+"""
+Checkpoints of metric state for incremental analysis
+
+MineMyMail exports grow by appending rows. A checkpoint records the byte
+offset up to which a CSV file has been analyzed along with the state of
+every metric at that point, so that the next analysis only has to process
+the rows after the offset. Digests of the head of the file and of the
+bytes just before the offset detect files that were rewritten rather than
+appended to, in which case the checkpoint is not used.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import hashlib
+import cPickle as pickle
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+DIGEST_SIZE = 65536
+
+##########################################################################
+## Helper Functions
+##########################################################################
+
+def digest(path, start, end):
+    """
+    SHA1 hex digest of the bytes in the range [start, end) of a file.
+    """
+    with open(path, 'rb') as data:
+        data.seek(start)
+        return hashlib.sha1(data.read(end - start)).hexdigest()
+
+def complete(path):
+    """
+    Returns the offset just after the last newline of the file, so that a
+    row that is still being appended is never processed.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as data:
+        position = size
+        while position > 0:
+            start = max(0, position - DIGEST_SIZE)
+            data.seek(start)
+            chunk = data.read(position - start)
+            found = chunk.rfind('\n')
+            if found >= 0:
+                return start + found + 1
+            position = start
+    return 0
+
+##########################################################################
+## Checkpoint
+##########################################################################
+
+class Checkpoint(object):
+    """
+    The analyzed offset of a CSV file, and the state and parameters of
+    its metrics.
+    """
+
+    def __init__(self, path, offset, states, **kwargs):
+        self.path   = os.path.abspath(path)
+        self.offset = offset
+        self.states = states
+        self.params = kwargs.get('params', {})
+        self.head   = kwargs.get('head', None) or self.digest_head()
+        self.tail   = kwargs.get('tail', None) or self.digest_tail()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a checkpoint from disk, None if it does not exist.
+        """
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as data:
+            return pickle.load(data)
+
+    def save(self, path):
+        """
+        Writes the checkpoint to disk, replacing the old one atomically.
+        """
+        tmppath = path + ".tmp"
+        with open(tmppath, 'wb') as out:
+            pickle.dump(self, out, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmppath, path)
+
+    def digest_head(self):
+        return digest(self.path, 0, min(self.offset, DIGEST_SIZE))
+
+    def digest_tail(self):
+        return digest(self.path, max(0, self.offset - DIGEST_SIZE), self.offset)
+
+    def is_valid(self, path, metrics):
+        """
+        Checks that the CSV file at path has only been appended to since
+        the checkpoint and that it holds the state of all the metrics, which
+        must be configured with the same parameters.
+        """
+        if os.path.abspath(path) != self.path:
+            return False
+
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < self.offset:
+            return False
+
+        params = getattr(self, 'params', {})
+        for metric in metrics:
+            name = metric.get_name()
+            if name not in self.states or params.get(name) != metric.get_params():
+                return False
+
+        return self.head == self.digest_head() and self.tail == self.digest_tail()
@@ -18,12 +18,13 @@ Console utilities for mailstat
 ##########################################################################
 
 import os
-import json
 import baker
 
 from datetime import datetime
 from mailstat.analyze import Analysis
 from mailstat.exceptions import ConsoleError
+from mailstat.reporting import compile_templates, output_paths, write_all
+from mailstat.reporting import FragmentCache
 from mailstat.utils.testgen import TestDataGenerator
 
 ##########################################################################
@@ -62,16 +63,39 @@ def testdata(names, domains, fixture=None, output=None):
     generator = TestDataGenerator(names, domains, fixture)
     generator.write(output)
 
+@baker.command
+def precompile(output=None):
+    """
+    Precompiles the report templates, e.g. when installing the package
+
+    :param output: the directory to write the compiled templates to
+    """
+    if output:
+        compile_templates(output)
+    else:
+        compile_templates()
+
 @baker.command(default=True)
-def analyze(emails, output=None):
+def analyze(emails, output=None, formats="html,json", workers=1, cache=False,
+            pipeline=False, batch_size=0, checkpoint=None, incremental=False):
     """
     Perform analysis of email csv and output HTML report
 
     :param emails: The email csv generated by MineMyMail
     :param output: The path to output the report
+    :param formats: Comma separated output formats (html, json, csv, npz, msgpack)
+    :param workers: The number of processes to analyze with
+    :param cache: Use the on-disk cache of the parsed CSV
+    :param pipeline: Read and parse the CSV in a background thread
+    :param batch_size: The number of rows per batch (0 for the default)
+    :param checkpoint: Checkpoint file to only analyze appended rows
+    :param incremental: Reuse the report sections of unchanged metrics
     """
-    output   = output or working_output("report-%s.json", True)
-    analysis = Analysis(emails)
+    formats  = [fmt.strip().lower() for fmt in formats.split(",") if fmt.strip()]
+    paths    = output_paths(output or working_output("report-%s", True), formats)
+    analysis = Analysis(emails, workers=workers, cache=cache,
+                        pipeline=pipeline, batch_size=batch_size or None,
+                        checkpoint=checkpoint)
     analysis.analyze()
-    with open(output, 'w') as outfile:
-        json.dump(analysis.serialize(), outfile, indent=2)
+    write_all(analysis.iterserialize(), paths, source=os.path.basename(emails),
+              fragments=FragmentCache() if incremental else None)
@@ -0,0 +1,145 @@
+# mailstat.index
+# Persisted line-offset index of CSV files
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Tue Jan 07 08:54:10 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: index.py [] benjamin@bengfort.com $
+
+"""
+Persisted line-offset index of CSV files
+
+A LineIndex is an array of the byte offsets at which each row of a CSV
+file starts (the header is not a row), which gives the number of rows and
+random access to any row without parsing the file. The index is built by
+scanning the raw bytes for newlines and is stored in a sidecar file next
+to the CSV (e.g. emails.csv.idx) so that it only has to be built once.
+
+Note: like sharding, the index assumes that rows do not contain quoted
+newlines.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import numpy as np
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+SUFFIX     = ".idx"
+CHUNK_SIZE = 4194304
+
+##########################################################################
+## Line Index
+##########################################################################
+
+class LineIndex(object):
+    """
+    Offsets of the rows of a CSV file, offsets[i] is the first byte of
+    row i and offsets[len(index)] is the size of the file.
+    """
+
+    def __init__(self, offsets, size, mtime):
+        self.offsets = offsets
+        self.size    = size
+        self.mtime   = mtime
+
+    @classmethod
+    def build(cls, path, chunk_size=CHUNK_SIZE):
+        """
+        Scans the file for newlines to build the index, blank lines are
+        skipped just as the csv module skips them.
+        """
+        stat    = os.stat(path)
+        breaks  = []
+
+        with open(path, 'rb') as data:
+            position = 0
+            while True:
+                chunk = data.read(chunk_size)
+                if not chunk: break
+                found = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10)
+                breaks.append(found.astype(np.int64) + position)
+                position += len(chunk)
+
+        # Every line starts after a newline, the last may not end with one
+        ends   = np.concatenate(breaks) if breaks else np.empty(0, dtype=np.int64)
+        starts = np.concatenate(([0], ends + 1))
+        ends   = np.concatenate((ends, [stat.st_size]))
+
+        # Drop the header, blank lines and the empty line after the last newline
+        lines  = np.flatnonzero(ends - starts > 0)[1:]
+
+        # Lines of a single byte are blank if that byte is a carriage return
+        with open(path, 'rb') as data:
+            blank = []
+            for idx in lines[ends[lines] - starts[lines] == 1]:
+                data.seek(starts[idx])
+                if data.read(1) == '\r':
+                    blank.append(idx)
+        lines  = np.setdiff1d(lines, np.array(blank, dtype=np.int64))
+
+        offsets = np.concatenate((starts[lines], [stat.st_size])).astype(np.int64)
+        return cls(offsets, stat.st_size, stat.st_mtime)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads the sidecar index of the CSV file at path, if it exists and
+        matches the current size and modification time of the file.
+        """
+        sidecar = path + SUFFIX
+        if not os.path.exists(sidecar):
+            return None
+
+        try:
+            with open(sidecar, 'rb') as data:
+                array = np.load(data)
+        except (IOError, ValueError):
+            return None
+
+        # The first two values are the size and mtime (in microseconds)
+        stat = os.stat(path)
+        if len(array) < 3 or array[0] != stat.st_size or array[1] != int(stat.st_mtime * 1e6):
+            return None
+        return cls(array[2:], stat.st_size, stat.st_mtime)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Loads the sidecar index or builds (and tries to save) a new one.
+        """
+        index = cls.load(path)
+        if index is None:
+            index = cls.build(path)
+            index.save(path)
+        return index
+
+    def save(self, path):
+        """
+        Writes the sidecar index for the CSV file at path, returns False
+        if the directory of the CSV file is not writable.
+        """
+        header = np.array([self.size, int(self.mtime * 1e6)], dtype=np.int64)
+        try:
+            with open(path + SUFFIX, 'wb') as out:
+                np.save(out, np.concatenate((header, self.offsets)))
+        except (IOError, OSError):
+            return False
+        return True
+
+    def span(self, start, stop):
+        """
+        Returns the byte range [begin, end) of the rows start to stop.
+        """
+        return self.offsets[start], self.offsets[stop]
+
+    def __len__(self):
+        return len(self.offsets) - 1
@@ -19,3 +19,11 @@ A versatile module for creating metrics for reports
 
 from .base import Metric
 from .domains import DomainDistribution
+from .counts import MostFrequentCorrespondents
+from .cardinality import DistinctCorrespondents, DistinctDomains
+from .cardinality import DistinctCountries, DistinctDisplayNames
+from .timeseries import TimeSeries, ActiveCorrespondents
+from .quantiles import CountQuantiles
+from .hierarchy import DomainHierarchy
+from .identity import IdentityResolution
+from .geography import GeographicDistribution
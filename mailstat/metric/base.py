@@ -18,6 +18,7 @@ The base metric class for all metrics
 ##########################################################################
 
 import abc
+import inspect
 
 from mailstat.exceptions import *
 
@@ -35,7 +36,8 @@ class Metric(object):
 
     __metaclass__ = abc.ABCMeta
 
-    name = None
+    name   = None
+    fields = None   # The row fields the metric reads, None for all fields
 
     def preprocess(self):
         """
@@ -46,18 +48,83 @@ class Metric(object):
     @abc.abstractmethod
     def process(self, row):
         """
-        Every metric will have access to a copy of every single row in the
-        dataset to perform it's analytics upon. The metric should store
+        Every metric will have access to a read-only view of every single
+        row in the dataset to perform it's analytics upon. The row is shared
+        by all metrics, so it cannot be modified. The metric should store
         its data on the instance and compute for each row accordingly.
         """
         raise NotImplementedError("Metrics must proccess rows.")
 
+    def process_batch(self, batch):
+        """
+        Optional vectorized alternative to `process`. If a metric implements
+        this hook it is called with column oriented batches of rows instead:
+        a dict of the fields to NumPy arrays (Categorical columns for the
+        string fields) as produced by M3Reader.iter_columns.
+        """
+        raise NotImplementedError("%s does not process batches." % self.__class__.__name__)
+
+    @property
+    def batched(self):
+        """
+        True if the metric implements the batch hook.
+        """
+        return self.process_batch.__func__ is not Metric.process_batch.__func__
+
     def postprocess(self):
         """
         This hook will be called after a dataset is completely processed.
         """
         return False
 
+    def merge(self, other):
+        """
+        Combines the state of another instance of this metric, computed on
+        a different part of the dataset, into this instance. Both metrics
+        have been preprocessed but neither has been postprocessed. Metrics
+        must implement this hook in order to be used in parallel analysis.
+        """
+        raise NotImplementedError("%s does not support merging." % self.__class__.__name__)
+
+    @property
+    def mergeable(self):
+        """
+        True if the metric implements the merge hook.
+        """
+        return self.merge.__func__ is not Metric.merge.__func__
+
+    def get_params(self):
+        """
+        Returns the configuration of the metric: the values of the arguments
+        of its constructor, which are stored on the instance by name. A
+        checkpoint is only restored into metrics with the same parameters.
+        """
+        init = getattr(self.__class__.__init__, '__func__', None)
+        if init is None:
+            return {}
+
+        names = inspect.getargspec(init).args[1:]
+        return dict((name, getattr(self, name)) for name in names if hasattr(self, name))
+
+    def get_state(self):
+        """
+        Returns the (picklable) state of the metric after processing, which
+        is saved in checkpoints for incremental analysis. By default this is
+        the instance dictionary without the parameters; override it for
+        state that can't pickle.
+        """
+        params = self.get_params()
+        return dict(
+            (key, value) for key, value in self.__dict__.iteritems() if key not in params
+        )
+
+    def set_state(self, state):
+        """
+        Restores the state of the metric from a checkpoint, after it has
+        been preprocessed and before any more rows are processed.
+        """
+        self.__dict__.update(state)
+
     @abc.abstractmethod
     def get_value(self):
         raise NotImplementedError("Metrics must report a value.")
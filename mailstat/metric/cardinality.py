@@ -0,0 +1,130 @@
+# mailstat.metric.cardinality
+# Distinct counts of correspondents, domains, countries and names
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Mon Jan 13 11:20:36 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: cardinality.py [] benjamin@bengfort.com $
+
+"""
+Distinct counts of correspondents, domains, countries and names
+
+An exact set of every distinct value does not fit in memory for very large
+or multi-file exports, so these metrics estimate the cardinality with a
+HyperLogLog sketch instead, which can be merged across shards and runs.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import numpy as np
+
+from mailstat.reader import *
+from mailstat.metric import Metric
+from mailstat.metric.domains import split_domains
+from mailstat.utils.sketches import HyperLogLog
+
+##########################################################################
+## Cardinality Metrics
+##########################################################################
+
+class DistinctCount(Metric):
+    """
+    Estimates the number of distinct, non-empty values of the `field` of
+    the rows with a HyperLogLog sketch of configurable precision.
+    """
+
+    field = None
+
+    def __init__(self, precision=14):
+        self.precision = precision
+
+    @property
+    def fields(self):
+        return (self.field,)
+
+    def preprocess(self):
+        """
+        Instantiate the sketch
+        """
+        self.sketch = HyperLogLog(self.precision)
+
+    def transform(self, values):
+        """
+        Converts an array of field values to the values that are counted,
+        e.g. email addresses to domains. By default the values themselves.
+        """
+        return values
+
+    def process(self, row):
+        """
+        Adds the value of the row to the sketch
+        """
+        if row[self.field]:
+            self.sketch.add(self.transform(np.array([row[self.field]], dtype=object)))
+
+    def process_batch(self, batch):
+        """
+        Adds the distinct values in the batch to the sketch, so that every
+        repeated value is only hashed once per batch.
+        """
+        column = batch[self.field]
+        values = column.categories[np.unique(column.codes)]
+        values = self.transform(values[values != u''])
+        self.sketch.add(values)
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+
+    def get_value(self):
+        """
+        The estimate and its relative standard error, along with the range
+        of two standard errors (about 95%) around the estimate.
+        """
+        estimate = self.sketch.estimate()
+        error    = self.sketch.error
+        return {
+            'estimate': int(round(estimate)),
+            'error': error,
+            'lower': int(max(0, estimate * (1 - 2 * error))),
+            'upper': int(round(estimate * (1 + 2 * error))),
+        }
+
+class DistinctCorrespondents(DistinctCount):
+    """
+    Estimated number of distinct email addresses
+    """
+
+    name  = "Distinct Correspondents"
+    field = EMAIL
+
+class DistinctDomains(DistinctCount):
+    """
+    Estimated number of distinct email domains
+    """
+
+    name  = "Distinct Domains"
+    field = EMAIL
+
+    def transform(self, values):
+        return split_domains(values)
+
+class DistinctCountries(DistinctCount):
+    """
+    Estimated number of distinct countries
+    """
+
+    name  = "Distinct Countries"
+    field = COUNTRY
+
+class DistinctDisplayNames(DistinctCount):
+    """
+    Estimated number of distinct display names
+    """
+
+    name  = "Distinct Display Names"
+    field = DISPLAY_NAME
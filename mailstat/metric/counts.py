@@ -17,7 +17,12 @@ Performs counting statistics of emails.
 ## Imports
 ##########################################################################
 
+import heapq
+import numpy as np
+
+from mailstat.reader import EMAIL, COUNT
 from mailstat.metric import Metric
+from mailstat.exceptions import ImproperlyConfigured
 
 ##########################################################################
 ## Metrics
@@ -25,6 +30,143 @@ from mailstat.metric import Metric
 
 class MostFrequentCorrespondents(Metric):
     """
-    Determines the top 10 most frequent communicators
+    Determines the top k (default 10) most frequent communicators by the
+    Count column, in memory that is bounded by k rather than the number
+    of distinct addresses.
+
+    In 'heap' mode every row is assumed to be a distinct address (as it is
+    in a single MineMyMail export) and a min-heap of the k largest counts
+    gives the exact top k. In 'spacesaving' mode addresses may repeat (e.g.
+    across several exports) and the weighted Space-Saving algorithm keeps
+    k counters; every reported count overestimates the true count by at
+    most its reported error.
     """
-    pass
+
+    name   = "Most Frequent Correspondents"
+    fields = (EMAIL, COUNT)
+    modes  = ('heap', 'spacesaving')
+
+    def __init__(self, k=10, mode='heap'):
+        if mode not in self.modes:
+            raise ImproperlyConfigured("Unknown mode '%s', use one of %s" % (mode, ", ".join(self.modes)))
+        self.k    = k
+        self.mode = mode
+
+    def preprocess(self):
+        """
+        Instantiate the heap (heap mode) or counters (spacesaving mode)
+        """
+        self.heap     = []
+        self.counters = {}
+
+    def process(self, row):
+        """
+        Adds the count of the correspondent in the row
+        """
+        if row[COUNT]:
+            self.add(row[EMAIL], row[COUNT])
+
+    def process_batch(self, batch):
+        """
+        Only the rows that can make it into the top k of the batch are added
+        in heap mode; spacesaving mode sums repeated addresses first.
+        """
+        emails = batch[EMAIL]
+        counts = batch[COUNT]
+
+        if self.mode == 'heap':
+            rows = np.flatnonzero(counts > 0)
+            if len(rows) > self.k:
+                rows = rows[np.argpartition(counts[rows], -self.k)[-self.k:]]
+        else:
+            codes, inverse = np.unique(emails.codes, return_inverse=True)
+            counts = np.bincount(inverse, weights=counts).astype(np.int64)
+            emails = emails.categories[codes]
+            rows   = np.flatnonzero(counts > 0)
+
+        for idx in rows:
+            self.add(emails[idx], int(counts[idx]))
+
+    def add(self, email, count):
+        """
+        Adds a count for an address to the summary of the current mode.
+        """
+        if self.mode == 'heap':
+            if len(self.heap) < self.k:
+                heapq.heappush(self.heap, (count, email))
+            elif count > self.heap[0][0]:
+                heapq.heappushpop(self.heap, (count, email))
+            return
+
+        if email in self.counters:
+            self.counters[email][0] += count
+            self.push(email)
+        elif len(self.counters) < self.k:
+            self.counters[email] = [count, 0]
+            self.push(email)
+        else:
+            # Replace the smallest counter, inheriting its count as error
+            minimum, evicted = self.minimum()
+            del self.counters[evicted]
+            self.counters[email] = [minimum + count, minimum]
+            self.push(email)
+
+    def push(self, email):
+        """
+        Pushes the current count of a counter onto the heap that finds the
+        smallest counter. Outdated entries are skipped lazily, and the heap
+        is rebuilt when they make up most of it to keep memory at O(k).
+        """
+        heapq.heappush(self.heap, (self.counters[email][0], email))
+        if len(self.heap) > 4 * max(self.k, 1):
+            self.heap = [(value[0], key) for key, value in self.counters.iteritems()]
+            heapq.heapify(self.heap)
+
+    def minimum(self):
+        """
+        Returns the count and address of the smallest counter.
+        """
+        while True:
+            count, email = self.heap[0]
+            if email in self.counters and self.counters[email][0] == count:
+                return count, email
+            heapq.heappop(self.heap)
+
+    def merge(self, other):
+        """
+        Merges the top k of another instance. Space-Saving summaries are
+        merged by adding the counters, where an address missing from a full
+        summary is assumed to have that summary's minimum count.
+        """
+        if self.mode == 'heap':
+            for count, email in other.heap:
+                self.add(email, count)
+            return
+
+        mins = [
+            min(value[0] for value in summary.itervalues())
+            if summary and len(summary) >= self.k else 0
+            for summary in (self.counters, other.counters)
+        ]
+
+        merged = {}
+        for email in set(self.counters) | set(other.counters):
+            ours   = self.counters.get(email, [mins[0], mins[0]])
+            theirs = other.counters.get(email, [mins[1], mins[1]])
+            merged[email] = [ours[0] + theirs[0], ours[1] + theirs[1]]
+
+        top = heapq.nlargest(self.k, merged.iteritems(), key=lambda item: item[1][0])
+        self.counters = dict(top)
+        self.heap     = [(value[0], key) for key, value in self.counters.iteritems()]
+        heapq.heapify(self.heap)
+
+    def get_value(self):
+        if self.mode == 'heap':
+            top = sorted(self.heap, reverse=True)
+            return [{'email': email, 'count': count} for count, email in top]
+
+        top = sorted(self.counters.iteritems(), key=lambda item: item[1][0], reverse=True)
+        return [
+            {'email': email, 'count': count, 'error': error}
+            for email, (count, error) in top
+        ]
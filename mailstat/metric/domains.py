@@ -17,9 +17,37 @@ Analyzes the domains of the mail data
 ## Imports
 ##########################################################################
 
+import numpy as np
+
 from mailstat.reader import EMAIL
 from mailstat.metric import Metric
 from collections import defaultdict
+from mailstat.utils.sketches import CountMinSketch
+
+##########################################################################
+## Helper Functions
+##########################################################################
+
+def split_domains(emails):
+    """
+    Vectorized domain of an array of email addresses: the text after the
+    first @ and up to the next one, as `email.split('@')[1]` would be.
+    """
+    domains = np.asarray(emails).astype(np.unicode_)
+    domains = np.char.partition(domains, u'@')[:, 2]
+    return np.char.partition(domains, u'@')[:, 0]
+
+def count_domains(emails):
+    """
+    Counts the domains of a Categorical of email addresses: the distinct
+    addresses are counted first, and only those are split into domains.
+    Returns the array of distinct domains and the array of their counts.
+    """
+    codes, counts = np.unique(emails.codes, return_counts=True)
+
+    domains = split_domains(emails.categories[codes])
+    domains, inverse = np.unique(domains, return_inverse=True)
+    return domains, np.bincount(inverse, weights=counts).astype(np.int64)
 
 ##########################################################################
 ## Domain Analysis
@@ -28,22 +56,99 @@ from collections import defaultdict
 class DomainDistribution(Metric):
     """
     Statistical distribution of email domains
+
+    By default every domain is counted exactly. In sketch mode the counts
+    are kept in a Count-Min Sketch of `width` x `depth` counters instead,
+    and only the `top` domains with the highest estimated counts (the
+    heavy hitters) are reported, so memory is fixed no matter how many
+    throwaway domains a mailbox contains.
     """
 
-    name = "Domain Distribution"
+    name   = "Domain Distribution"
+    fields = (EMAIL,)
+
+    def __init__(self, sketch=False, width=16384, depth=4, top=100):
+        self.sketch = sketch
+        self.width  = width
+        self.depth  = depth
+        self.top    = top
 
     def preprocess(self):
         """
         Instantiate the data store for domain counting
         """
         self.data = defaultdict(int)
+        if self.sketch:
+            self.counts    = CountMinSketch(self.width, self.depth)
+            self.threshold = 0
 
     def process(self, row):
         """
-        Increments the frequency distribution for email domains
+        Increments the frequency distribution for email domains. In sketch
+        mode the heavy hitters are only re-estimated when the domain of the
+        row is not one of them and its estimate beats the smallest one.
         """
         domain = row[EMAIL].split('@')[1]
-        self.data[domain] += 1
+        if not self.sketch:
+            self.data[domain] += 1
+            return
+
+        estimate = int(self.counts.update((domain,))[0])
+        if domain in self.data or len(self.data) < self.top:
+            self.data[domain] = estimate
+        elif estimate > self.threshold:
+            self.update_heavy_hitters(np.array([domain], dtype=object))
+
+    def process_batch(self, batch):
+        """
+        Vectorized frequency distribution: counts the distinct addresses in
+        the batch, splits only those into domains and sums their counts.
+        """
+        domains, totals = count_domains(batch[EMAIL])
+        if self.sketch:
+            return self.add_sketch(domains, totals)
+
+        for domain, count in zip(domains.tolist(), totals.tolist()):
+            self.data[domain] += count
+
+    def add_sketch(self, domains, counts):
+        """
+        Adds domain counts to the sketch and updates the heavy hitters.
+        """
+        self.counts.add(domains, counts)
+        self.update_heavy_hitters(domains)
+
+    def update_heavy_hitters(self, domains):
+        """
+        Re-estimates the current heavy hitters and the candidate domains
+        and keeps the `top` domains with the highest estimates in data.
+        """
+        candidates = np.array(list(set(self.data) | set(domains.tolist())), dtype=object)
+        estimates  = self.counts.query(candidates)
+
+        if len(candidates) > self.top:
+            keep = np.argpartition(estimates, -self.top)[-self.top:]
+            candidates, estimates = candidates[keep], estimates[keep]
+
+        self.data = defaultdict(int, zip(candidates.tolist(), estimates.tolist()))
+
+        # Estimates only grow, so this stays a lower bound of the smallest
+        self.threshold = int(estimates.min()) if len(estimates) else 0
+
+    def merge(self, other):
+        """
+        Adds the domain frequencies of another distribution to this one
+        """
+        if self.sketch:
+            self.counts.merge(other.counts)
+            return self.update_heavy_hitters(np.array(other.data.keys(), dtype=object))
+
+        for domain, count in other.data.iteritems():
+            self.data[domain] += count
 
     def get_value(self):
+        if self.sketch:
+            # Rows only refresh the estimate of their own domain
+            domains = np.array(self.data.keys(), dtype=object)
+            return defaultdict(int, zip(domains.tolist(), self.counts.query(domains).tolist()))
         return self.data
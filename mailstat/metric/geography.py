@@ -0,0 +1,124 @@
+# mailstat.metric.geography
+# Distribution of correspondents by country, region and city
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Mon Jan 20 09:15:42 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: geography.py [] benjamin@bengfort.com $
+
+"""
+Distribution of correspondents by country, region and city
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import numpy as np
+
+from mailstat.reader import CITY, REGION, COUNTRY
+from mailstat.metric import Metric
+from collections import defaultdict
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+UNKNOWN = u"(unknown)"
+BITS    = 21                # Bits of each id in a packed location key
+MASK    = (1 << BITS) - 1
+
+##########################################################################
+## Geographic Metric
+##########################################################################
+
+class GeographicDistribution(Metric):
+    """
+    Counts of the correspondents by country, region within the country
+    and city within the region, computed in one pass.
+
+    Place names are interned: every distinct name is stored once in a
+    table and the counts are kept per (country, region, city) tuple of
+    small integer ids, so merging only has to remap the ids of the other
+    table. The nested rollup is built from the tuples when reported.
+    """
+
+    name   = "Geographic Distribution"
+    fields = (COUNTRY, REGION, CITY)
+
+    def preprocess(self):
+        """
+        Instantiate the intern table and the location counts
+        """
+        self.names  = [u'']
+        self.ids    = {u'': 0}
+        self.counts = defaultdict(int)
+
+    def intern(self, name):
+        """
+        Returns the id of a place name, adding it to the table if needed.
+        """
+        try:
+            return self.ids[name]
+        except KeyError:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+            return self.ids[name]
+
+    def process(self, row):
+        """
+        Counts the location of the row
+        """
+        key = tuple(self.intern(row[field] or u'') for field in self.fields)
+        self.counts[key] += 1
+
+    def process_batch(self, batch):
+        """
+        Maps the categories of each column to interned ids, then counts the
+        distinct locations of the batch with their ids packed in an int64,
+        or as rows of ids once there are too many names to pack.
+        """
+        columns = []
+        for field in self.fields:
+            column = batch[field]
+            ids    = np.array([self.intern(name) for name in column.categories.tolist()], dtype=np.int64)
+            columns.append(ids[column.codes])
+
+        if len(self.names) - 1 > MASK:
+            locations, counts = np.unique(np.column_stack(columns), axis=0, return_counts=True)
+            for location, count in zip(map(tuple, locations.tolist()), counts.tolist()):
+                self.counts[location] += count
+            return
+
+        keys = np.zeros(len(batch[COUNTRY]), dtype=np.int64)
+        for ids in columns:
+            keys = (keys << BITS) | ids
+
+        keys, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.counts[(key >> 2 * BITS, (key >> BITS) & MASK, key & MASK)] += count
+
+    def merge(self, other):
+        """
+        Adds the counts of another instance, remapped to the ids of ours.
+        """
+        remap = [self.intern(name) for name in other.names]
+        for (country, region, city), count in other.counts.iteritems():
+            self.counts[(remap[country], remap[region], remap[city])] += count
+
+    def get_value(self):
+        """
+        Nested counts: {country: {count, regions: {region: {count, cities}}}}
+        """
+        label  = lambda ident: self.names[ident] or UNKNOWN
+        value  = {}
+        for (country, region, city), count in self.counts.iteritems():
+            country = value.setdefault(label(country), {'count': 0, 'regions': {}})
+            region  = country['regions'].setdefault(label(region), {'count': 0, 'cities': {}})
+            country['count'] += count
+            region['count']  += count
+            region['cities'][label(city)] = region['cities'].get(label(city), 0) + count
+        return value
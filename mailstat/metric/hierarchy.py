@@ -0,0 +1,211 @@
+# mailstat.metric.hierarchy
+# Rollups of email domains to registrable domains, organizations and TLDs
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Thu Jan 16 08:52:19 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: hierarchy.py [] benjamin@bengfort.com $
+
+"""
+Rollups of email domains to registrable domains, organizations and TLDs
+
+Whether mail.gmail.co.uk belongs to gmail.co.uk or to co.uk depends on the
+public suffixes, which are loaded once at import from the bundled table in
+data/suffixes.txt into a trie of reversed domain labels. Every domain is
+rolled up to all levels of the hierarchy with a single memoized lookup.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import codecs
+
+from mailstat.reader import EMAIL
+from mailstat.metric import Metric
+from mailstat.metric.domains import count_domains
+from collections import defaultdict
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+SUFFIXES  = os.path.join(os.path.dirname(__file__), "data", "suffixes.txt")
+MEMO_SIZE = 8192
+RULE      = "."     # Keys that mark the end of a rule in the trie, which
+EXCEPTION = "!"     # can never be domain labels since labels have no dots
+WILDCARD  = "*"
+
+LEVELS    = ('tld', 'registrable', 'organization')
+
+##########################################################################
+## Suffix Trie
+##########################################################################
+
+class SuffixTrie(object):
+    """
+    Trie of public suffix rules keyed by the reversed labels of the rules,
+    e.g. co.uk is stored as uk -> co. Splitting a domain walks its reversed
+    labels down the trie to find the longest matching public suffix.
+
+    Lookups are memoized in a bounded, two generation memo like the one of
+    the DateParser, so repeated domains only cost a dict lookup.
+    """
+
+    def __init__(self, rules=(), memo=MEMO_SIZE):
+        self.root = {}
+        self.memo = memo
+        for rule in rules:
+            self.insert(rule)
+        self.clear()
+
+    @classmethod
+    def load(klass, path=SUFFIXES, **kwargs):
+        """
+        Loads a trie from a file in the Public Suffix List format.
+        """
+        with codecs.open(path, 'r', encoding='utf8') as rules:
+            rules = (line.split()[0] for line in rules if line.strip())
+            return klass((rule for rule in rules if not rule.startswith('//')), **kwargs)
+
+    def insert(self, rule):
+        """
+        Adds a suffix, wildcard (*.ck) or exception (!www.ck) rule.
+        """
+        mark = EXCEPTION if rule.startswith(EXCEPTION) else RULE
+        node = self.root
+        for label in reversed(rule.lstrip(EXCEPTION).lower().split('.')):
+            node = node.setdefault(label, {})
+        node[mark] = True
+
+    def suffix_length(self, labels):
+        """
+        The number of labels of the public suffix of a domain, given its
+        labels in reverse. Exception rules take precedence over all other
+        rules, then the longest match wins; unknown TLDs are suffixes.
+        """
+        length = 1
+        nodes  = [self.root]
+        for depth, label in enumerate(labels, 1):
+            nodes = [node[key] for node in nodes for key in (label, WILDCARD) if key in node]
+            if not nodes:
+                break
+
+            for node in nodes:
+                if EXCEPTION in node:
+                    return depth - 1
+                if RULE in node:
+                    length = depth
+        return length
+
+    def clear(self):
+        """
+        Empties the memo of split domains.
+        """
+        self._recent = {}
+        self._older  = {}
+
+    def __call__(self, domain):
+        try:
+            return self._recent[domain]
+        except KeyError:
+            pass
+
+        if domain in self._older:
+            parts = self._older.pop(domain)
+        else:
+            parts = self.split(domain)
+
+        if len(self._recent) >= self.memo // 2:
+            self._older  = self._recent
+            self._recent = {}
+
+        self._recent[domain] = parts
+        return parts
+
+    def split(self, domain):
+        """
+        Splits a domain into its TLD, registrable domain (the public suffix
+        and one more label) and organization (that label) without the memo.
+        A domain that is itself a public suffix is its own registrable
+        domain and organization.
+        """
+        labels = domain.lower().strip('.').split('.')
+        length = min(self.suffix_length(reversed(labels)), len(labels))
+
+        if length == len(labels):
+            registrable = organization = u'.'.join(labels)
+        else:
+            registrable  = u'.'.join(labels[-length-1:])
+            organization = labels[-length-1]
+
+        return labels[-1], registrable, organization
+
+    def __getstate__(self):
+        """
+        The memo is not pickled when tries are sent to other processes.
+        """
+        state = self.__dict__.copy()
+        state['_recent'] = {}
+        state['_older']  = {}
+        return state
+
+PUBLIC_SUFFIXES = SuffixTrie.load()
+
+##########################################################################
+## Domain Hierarchy Metric
+##########################################################################
+
+class DomainHierarchy(Metric):
+    """
+    Counts of the email domains rolled up to their top level domains,
+    registrable domains (e.g. yahoo.co.in for mail.yahoo.co.in) and
+    organizations (e.g. yahoo for yahoo.com and yahoo.co.in) in one pass.
+    A SuffixTrie can be given instead of the bundled public suffixes.
+    """
+
+    name   = "Domain Hierarchy"
+    fields = (EMAIL,)
+
+    def __init__(self, suffixes=None):
+        self.suffixes = suffixes
+
+    def preprocess(self):
+        """
+        Instantiate the counts of every level of the hierarchy
+        """
+        self.data = dict((level, defaultdict(int)) for level in LEVELS)
+
+    def process(self, row):
+        """
+        Rolls up the domain of the email in the row
+        """
+        self.add(row[EMAIL].partition('@')[2].partition('@')[0], 1)
+
+    def process_batch(self, batch):
+        """
+        Rolls up the distinct domains of the batch with their counts
+        """
+        domains, counts = count_domains(batch[EMAIL])
+        for domain, count in zip(domains.tolist(), counts.tolist()):
+            self.add(domain, count)
+
+    def add(self, domain, count):
+        """
+        Adds the count of a domain to every level of the hierarchy.
+        """
+        if not domain: return
+        for level, key in zip(LEVELS, (self.suffixes or PUBLIC_SUFFIXES)(domain)):
+            self.data[level][key] += count
+
+    def merge(self, other):
+        for level in LEVELS:
+            for key, count in other.data[level].iteritems():
+                self.data[level][key] += count
+
+    def get_value(self):
+        return dict((level, dict(counts)) for level, counts in self.data.iteritems())
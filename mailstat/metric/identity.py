@@ -0,0 +1,238 @@
+# mailstat.metric.identity
+# Resolves the email addresses that belong to the same person
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Fri Jan 17 10:12:48 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: identity.py [] benjamin@bengfort.com $
+
+"""
+Resolves the email addresses that belong to the same person
+
+Comparing every pair of addresses is quadratic, so addresses are grouped
+into blocks that share a normalized last name or a normalized local part
+(including the handles, like jsmith or smithj, derived from the name and
+initials) and are only compared to the other addresses in their blocks.
+Matching pairs are joined in a union-find forest whose sets are the people.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import re
+import unicodedata
+import numpy as np
+
+from mailstat.reader import *
+from mailstat.metric import Metric
+from mailstat.utils.unionfind import UnionFind
+from collections import defaultdict
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+MAX_BLOCK  = 200    # Larger blocks are too common to discriminate people
+MIN_LOCAL  = 6      # Shorter local parts are too common to link on alone
+MIN_PREFIX = 3      # Shortest first name that matches a longer one
+
+SUFFIXES   = frozenset(('jr', 'sr', 'ii', 'iii', 'iv', 'phd', 'md', 'esq'))
+ROLES      = frozenset((
+    'admin', 'alerts', 'billing', 'contact', 'help', 'hello', 'info',
+    'mail', 'mailerdaemon', 'marketing', 'news', 'newsletter', 'noreply',
+    'notifications', 'office', 'postmaster', 'sales', 'service', 'support',
+    'team', 'webmaster',
+))
+
+WORDS      = re.compile(r'[^\W\d_]+', re.UNICODE)
+
+##########################################################################
+## Helper Functions
+##########################################################################
+
+def normalize(text):
+    """
+    Lower case ASCII letters and digits of a string, without accents.
+    """
+    if not text: return u''
+    text = unicodedata.normalize('NFKD', unicode(text)).encode('ascii', 'ignore')
+    return re.sub(r'[^a-z0-9]', '', text.lower())
+
+def local_part(email):
+    """
+    The normalized local part of an address, without +tags, punctuation
+    and trailing digits, e.g. john.smith+news42 is johnsmith.
+    """
+    local = email.partition(u'@')[0].partition(u'+')[0]
+    return normalize(local).rstrip('0123456789')
+
+def parse_name(first, last, display):
+    """
+    The normalized first and last name, from the name fields or else from
+    the display name ("First Last" or "Last, First"). Either may be empty.
+    """
+    first = WORDS.findall(first or u'')
+    last  = [word for word in WORDS.findall(last or u'') if normalize(word) not in SUFFIXES]
+
+    if not (first and last) and display and u'@' not in display:
+        if u',' in display:
+            last, _, first = display.partition(u',')
+            first, last = WORDS.findall(first), WORDS.findall(last)
+        else:
+            words = [word for word in WORDS.findall(display) if normalize(word) not in SUFFIXES]
+            first, last = words[:1], words[1:][-1:]
+
+    return (normalize(first[0]) if first else u''), (normalize(last[-1]) if last else u'')
+
+def handles(first, last):
+    """
+    The local parts that people commonly build from their names.
+    """
+    if not (first and last): return ()
+    return (first + last, last + first, first[0] + last, last + first[0])
+
+##########################################################################
+## Identity Resolution Metric
+##########################################################################
+
+class IdentityResolution(Metric):
+    """
+    Clusters of the email addresses that appear to belong to one person.
+
+    Two addresses are linked if their people have the same last name and
+    first names that are equal or abbreviate each other (Jon, Jonathan),
+    if one address has no name but its local part is a handle of the other
+    person's name, or if neither has a name but their (long, non-role)
+    local parts are the same. Blocks with more than `max_block` addresses
+    are skipped, which bounds the number of comparisons.
+    """
+
+    name   = "Identity Resolution"
+    fields = (EMAIL, DISPLAY_NAME, FIRST_NAME, LAST_NAME)
+
+    def __init__(self, max_block=MAX_BLOCK):
+        self.max_block = max_block
+
+    def preprocess(self):
+        """
+        Instantiate the records of the distinct addresses
+        """
+        self.records  = {}
+        self.clusters = []
+
+    def process(self, row):
+        """
+        Records the normalized name and local part of the address
+        """
+        self.add(row[EMAIL], row[FIRST_NAME], row[LAST_NAME], row[DISPLAY_NAME])
+
+    def process_batch(self, batch):
+        """
+        Records the first row of every distinct address in the batch
+        """
+        emails = batch[EMAIL]
+        codes, rows = np.unique(emails.codes, return_index=True)
+        for idx in rows:
+            self.add(emails[idx], batch[FIRST_NAME][idx], batch[LAST_NAME][idx], batch[DISPLAY_NAME][idx])
+
+    def add(self, email, first, last, display):
+        """
+        Adds the record of an address, unless it already has a named one.
+        """
+        email = email.lower()
+        if email in self.records and self.records[email][1]:
+            return
+        self.records[email] = parse_name(first, last, display) + (local_part(email),)
+
+    def merge(self, other):
+        for email, record in other.records.iteritems():
+            if email not in self.records or not self.records[email][1]:
+                self.records[email] = record
+
+    def blocking_keys(self, record):
+        """
+        The blocks of a record: its last name and the local parts it has
+        or could have, unless the local part is a role account.
+        """
+        first, last, local = record
+        keys = [('local', handle) for handle in handles(first, last)]
+        if last:
+            keys.append(('last', last))
+        if len(local) >= MIN_LOCAL and local not in ROLES:
+            keys.append(('local', local))
+        return keys
+
+    def match(self, record, other):
+        """
+        True if two records appear to belong to the same person.
+        """
+        (first, last, local), (ofirst, olast, olocal) = record, other
+        if first and last and ofirst and olast:
+            if last != olast:
+                return False
+            if first == ofirst:
+                return True
+            short, full = sorted((first, ofirst), key=len)
+            return len(short) >= MIN_PREFIX and full.startswith(short)
+
+        if first and last:
+            return olocal in handles(first, last)
+        if ofirst and olast:
+            return local in handles(ofirst, olast)
+
+        return local == olocal and len(local) >= MIN_LOCAL and local not in ROLES
+
+    def postprocess(self):
+        """
+        Compares the records within every block and clusters the matches.
+
+        Addresses without names are linked to named people last, and only
+        if all of their matches are one person, since a handle like smithj
+        would otherwise join John Smith and Jane Smith.
+        """
+        named  = lambda email: all(self.records[email][:2])
+        blocks = defaultdict(list)
+        for email, record in self.records.iteritems():
+            for key in self.blocking_keys(record):
+                blocks[key].append(email)
+
+        forest     = UnionFind(self.records)
+        candidates = defaultdict(set)
+        for members in blocks.itervalues():
+            if not 1 < len(members) <= self.max_block:
+                continue
+
+            for idx, email in enumerate(members):
+                for other in members[idx+1:]:
+                    if forest.connected(email, other):
+                        continue
+                    if not self.match(self.records[email], self.records[other]):
+                        continue
+
+                    if named(email) == named(other):
+                        forest.union(email, other)
+                    elif named(email):
+                        candidates[other].add(email)
+                    else:
+                        candidates[email].add(other)
+
+        # Unnamed addresses were only joined to each other, so their sets
+        # are linked if the matches of the whole set are a single person
+        people = defaultdict(set)
+        for email, matches in candidates.iteritems():
+            people[forest.find(email)].update(matches)
+
+        for unnamed, matches in people.iteritems():
+            roots = set(forest.find(email) for email in matches)
+            if len(roots) == 1:
+                forest.union(unnamed, roots.pop())
+
+        clusters = [sorted(members) for members in forest.sets() if len(members) > 1]
+        self.clusters = sorted(clusters, key=lambda members: (-len(members), members))
+
+    def get_value(self):
+        return self.clusters
@@ -0,0 +1,191 @@
+# mailstat.metric.quantiles
+# Streaming quantile summaries of the Count column
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Wed Jan 15 09:27:51 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: quantiles.py [] benjamin@bengfort.com $
+
+"""
+Streaming quantile summaries of the Count column
+
+Sorting every count to find the median and tail percentiles does not scale
+to very large exports, so the counts are summarized with a T-Digest, which
+has a fixed size and can be merged across shards and incremental runs.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import numpy as np
+
+from mailstat.reader import EMAIL, COUNT
+from mailstat.metric import Metric
+from mailstat.metric.domains import split_domains
+from mailstat.utils.sketches import TDigest, CountMinSketch
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+OTHER = u"(other)"
+
+##########################################################################
+## Quantile Metrics
+##########################################################################
+
+class CountQuantiles(Metric):
+    """
+    Median, p90 and p99 (by default) of the message counts of the
+    correspondents, estimated with a T-Digest of the given compression.
+
+    With `domains` the quantiles are also computed per email domain. The
+    number of correspondents of every domain is estimated with a Count-Min
+    Sketch, and only the `max_domains` heavy hitters get their own digest;
+    the counts of any other domain, including those of a domain before it
+    became a heavy hitter, are summarized together as "(other)", so memory
+    is bounded by the number of digests rather than distinct domains.
+    """
+
+    name = "Count Quantiles"
+
+    def __init__(self, quantiles=(0.5, 0.9, 0.99), compression=100, domains=False, max_domains=100, width=16384, depth=4):
+        self.quantiles   = quantiles
+        self.compression = compression
+        self.domains     = domains
+        self.max_domains = max_domains
+        self.width       = width
+        self.depth       = depth
+
+    @property
+    def fields(self):
+        if self.domains:
+            return (EMAIL, COUNT)
+        return (COUNT,)
+
+    def preprocess(self):
+        """
+        Instantiate the overall digest, the per-domain digests and the
+        sketch of the domain sizes
+        """
+        self.digest  = TDigest(self.compression)
+        self.digests = {}
+        if self.domains:
+            self.sizes     = CountMinSketch(self.width, self.depth)
+            self.threshold = 0
+
+    def process(self, row):
+        """
+        Adds the count of the row (rows without a count are skipped). The
+        tracked domains are only updated when the row's domain is not
+        tracked and its size may have reached the smallest tracked one.
+        """
+        count = row[COUNT]
+        if not count:
+            return
+
+        self.digest.add((count,))
+        if not self.domains:
+            return
+
+        domain = row[EMAIL].partition(u'@')[2].partition(u'@')[0]
+        self.sizes.add((domain,))
+        if domain not in self.digests:
+            full = len(self.digests) - (OTHER in self.digests) >= self.max_domains
+            if not full or self.sizes.query((domain,))[0] >= self.threshold:
+                if domain not in self.track((domain,)):
+                    domain = OTHER
+            else:
+                domain = OTHER
+        self.domain_digest(domain).add((count,))
+
+    def process_batch(self, batch):
+        """
+        Adds the non-zero counts of the batch to the overall digest, and to
+        the digest of each domain grouped with a single sort.
+        """
+        counts = batch[COUNT]
+        rows   = np.flatnonzero(counts > 0)
+        counts = counts[rows]
+        self.digest.add(counts)
+
+        if not self.domains or not len(rows):
+            return
+
+        domains, inverse = np.unique(split_domains(batch[EMAIL][rows]), return_inverse=True)
+        self.sizes.add(domains, np.bincount(inverse))
+        tracked = self.track(domains)
+
+        order  = np.argsort(inverse, kind='mergesort')
+        bounds = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+        for domain, group in zip(domains, np.split(counts[order], bounds[1:])):
+            self.domain_digest(domain if domain in tracked else OTHER).add(group)
+
+    def track(self, domains):
+        """
+        Keeps the `max_domains` domains with the most estimated
+        correspondents among the tracked and the given domains (ties are
+        broken by name), folds the digests of the others into "(other)"
+        and returns the set of tracked domains.
+        """
+        candidates = set(self.digests)
+        candidates.update(domains)
+        candidates.discard(OTHER)
+        candidates = np.array(sorted(candidates), dtype=object)
+
+        estimates  = self.sizes.query(candidates)
+        order      = np.lexsort((np.arange(len(candidates)), -estimates))[:self.max_domains]
+        tracked    = set(candidates[order].tolist())
+
+        # Tracked sizes only grow, so this stays a lower bound of the smallest
+        self.threshold = int(estimates[order].min()) if len(order) else 0
+
+        for domain in sorted(self.digests):
+            if domain != OTHER and domain not in tracked:
+                self.domain_digest(OTHER).merge(self.digests.pop(domain))
+        return tracked
+
+    def domain_digest(self, domain):
+        """
+        The digest of the domain, created when it is first used.
+        """
+        if domain not in self.digests:
+            self.digests[domain] = TDigest(self.compression)
+        return self.digests[domain]
+
+    def merge(self, other):
+        """
+        Merges the digests and domain sizes of another metric; the digests
+        of domains that are not tracked after the merge (and "(other)"
+        itself) are folded into "(other)".
+        """
+        self.digest.merge(other.digest)
+        if not self.domains:
+            return
+
+        self.sizes.merge(other.sizes)
+        tracked = self.track(np.array(other.digests.keys(), dtype=object))
+        for domain, digest in sorted(other.digests.iteritems()):
+            self.domain_digest(domain if domain in tracked else OTHER).merge(digest)
+
+    def summarize(self, digest):
+        """
+        The count and quantiles of a digest as a JSON-native dictionary.
+        """
+        value = {'count': digest.count}
+        for q, estimate in zip(self.quantiles, digest.quantile(self.quantiles)):
+            value['p%g' % (q * 100)] = None if np.isnan(estimate) else float(estimate)
+        return value
+
+    def get_value(self):
+        value = self.summarize(self.digest)
+        if self.domains:
+            value['domains'] = dict(
+                (domain, self.summarize(digest))
+                for domain, digest in self.digests.iteritems()
+            )
+        return value
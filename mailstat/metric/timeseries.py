@@ -0,0 +1,251 @@
+# mailstat.metric.timeseries
+# Histograms of the first and last seen timestamps
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Tue Jan 14 10:06:33 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: timeseries.py [] benjamin@bengfort.com $
+
+"""
+Histograms of the first and last seen timestamps, and the number of
+correspondents that were active between them over time.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import numpy as np
+
+from mailstat.reader import FIRST_SEEN, LAST_SEEN
+from mailstat.metric import Metric
+from mailstat.exceptions import ImproperlyConfigured
+from collections import defaultdict
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+GRANULARITIES = ('day', 'week', 'month', 'year')
+
+##########################################################################
+## Helper Functions
+##########################################################################
+
+def bin_timestamps(timestamps, granularity):
+    """
+    Bins an array of datetime64 timestamps into integer bins of the given
+    granularity: days, weeks (starting on Monday, as the day number of the
+    Monday), months or years since the epoch. NaT timestamps are dropped.
+    """
+    timestamps = timestamps[~np.isnat(timestamps)]
+
+    if granularity == 'day':
+        return timestamps.astype('datetime64[D]').astype(np.int64)
+
+    if granularity == 'week':
+        # The epoch (1970-01-01) was a Thursday, three days after a Monday
+        days = timestamps.astype('datetime64[D]').astype(np.int64)
+        return days - (days + 3) % 7
+
+    if granularity == 'month':
+        return timestamps.astype('datetime64[M]').astype(np.int64)
+
+    return timestamps.astype('datetime64[Y]').astype(np.int64)
+
+def bin_label(value, granularity):
+    """
+    The ISO label of an integer bin, e.g. 2013-12-30, 2013-12 or 2013.
+    """
+    unit = {'day': 'D', 'week': 'D', 'month': 'M', 'year': 'Y'}[granularity]
+    return str(np.datetime64(int(value), unit))
+
+##########################################################################
+## Time Series Metric
+##########################################################################
+
+class TimeSeries(Metric):
+    """
+    Day, week, month and year histograms of the First Seen and Last Seen
+    timestamps, all computed in a single pass with vectorized binning.
+    """
+
+    name   = "Time Series"
+    fields = (FIRST_SEEN, LAST_SEEN)
+
+    def preprocess(self):
+        """
+        Instantiate a histogram per field and granularity
+        """
+        self.histograms = dict(
+            (field, dict((gran, defaultdict(int)) for gran in GRANULARITIES))
+            for field in self.fields
+        )
+
+    def process(self, row):
+        """
+        Bins the timestamps of a single row (prefer process_batch)
+        """
+        self.process_batch(dict(
+            (field, np.array([row[field] or None], dtype='datetime64[s]'))
+            for field in self.fields
+        ))
+
+    def process_batch(self, batch):
+        """
+        Bins the batch for every granularity and adds the bin counts, so
+        the histograms are updated once per distinct bin, not per row.
+        """
+        for field in self.fields:
+            for gran in GRANULARITIES:
+                bins, counts = np.unique(bin_timestamps(batch[field], gran), return_counts=True)
+                histogram = self.histograms[field][gran]
+                for value, count in zip(bins.tolist(), counts.tolist()):
+                    histogram[value] += count
+
+    def merge(self, other):
+        for field in self.fields:
+            for gran in GRANULARITIES:
+                histogram = self.histograms[field][gran]
+                for value, count in other.histograms[field][gran].iteritems():
+                    histogram[value] += count
+
+    def get_value(self):
+        return dict(
+            (field, dict(
+                (gran, dict(
+                    (bin_label(value, gran), count)
+                    for value, count in self.histograms[field][gran].iteritems()
+                ))
+                for gran in GRANULARITIES
+            ))
+            for field in self.fields
+        )
+
+##########################################################################
+## Active Correspondents Metric
+##########################################################################
+
+class ActiveCorrespondents(Metric):
+    """
+    Number of correspondents that were active (between their First Seen
+    and Last Seen) in every day, week, month or year by `granularity`.
+
+    The intervals are kept as arrays of start and end events, which are
+    concatenated to merge shards. The series is computed with one sort of
+    each and a binary search per bucket rather than by testing every
+    interval against every bucket. Rows without a Last Seen are active
+    only at their First Seen.
+    """
+
+    name   = "Active Correspondents"
+    fields = (FIRST_SEEN, LAST_SEEN)
+
+    def __init__(self, granularity='day'):
+        if granularity not in GRANULARITIES:
+            raise ImproperlyConfigured(
+                "Unknown granularity '%s', use one of %s" % (granularity, ", ".join(GRANULARITIES))
+            )
+        self.granularity = granularity
+
+    def preprocess(self):
+        """
+        Instantiate the lists of event arrays
+        """
+        self.starts = []
+        self.ends   = []
+
+    def process(self, row):
+        """
+        Adds the interval of a single row (prefer process_batch)
+        """
+        self.process_batch(dict(
+            (field, np.array([row[field] or None], dtype='datetime64[s]'))
+            for field in self.fields
+        ))
+
+    def process_batch(self, batch):
+        """
+        Adds the start and end events of the intervals in the batch
+        """
+        starts = batch[FIRST_SEEN].astype('datetime64[s]')
+        ends   = batch[LAST_SEEN].astype('datetime64[s]')
+        valid  = ~np.isnat(starts)
+
+        starts = starts[valid].astype(np.int64)
+        ends   = ends[valid]
+        ends   = np.where(np.isnat(ends), starts, ends.astype(np.int64))
+
+        self.starts.append(starts)
+        self.ends.append(np.maximum(starts, ends))
+        if len(self.starts) >= 1024:
+            self.compact()
+
+    def compact(self):
+        """
+        Concatenates the event arrays into one array of each kind.
+        """
+        self.starts = [np.concatenate(self.starts)] if self.starts else []
+        self.ends   = [np.concatenate(self.ends)] if self.ends else []
+
+    def merge(self, other):
+        self.starts.extend(other.starts)
+        self.ends.extend(other.ends)
+        self.compact()
+
+    def events(self):
+        """
+        The sorted start and end times in seconds since the epoch.
+        """
+        self.compact()
+        if not self.starts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.sort(self.starts[0]), np.sort(self.ends[0])
+
+    def step(self):
+        """
+        The step function of active correspondents: the times (seconds
+        since the epoch) at which the count changes and the counts from
+        then on. An interval is active through the second of its end.
+        """
+        starts, ends = self.events()
+        times  = np.concatenate([starts, ends + 1])
+        deltas = np.concatenate([np.ones(len(starts), np.int64), -np.ones(len(ends), np.int64)])
+
+        times, inverse = np.unique(times, return_inverse=True)
+        return times, np.cumsum(np.bincount(inverse, weights=deltas)).astype(np.int64)
+
+    def buckets(self):
+        """
+        The bins of the buckets from the first start to the last end, and
+        the first and last second of every bucket.
+        """
+        starts, ends = self.events()
+        bounds = np.array([starts[0], ends[-1]], dtype='datetime64[s]')
+        first, last = bin_timestamps(bounds, self.granularity)
+
+        unit, step = {'day': ('D', 1), 'week': ('D', 7), 'month': ('M', 1), 'year': ('Y', 1)}[self.granularity]
+        bins  = np.arange(first, last + step, step)
+        edges = np.r_[bins, bins[-1] + step].astype('datetime64[%s]' % unit)
+        edges = edges.astype('datetime64[s]').astype(np.int64)
+        return bins, edges[:-1], edges[1:] - 1
+
+    def get_value(self):
+        """
+        The number of correspondents that were active at any time in each
+        bucket: those that started by its end, less those that ended
+        before it began.
+        """
+        starts, ends = self.events()
+        if not len(starts):
+            return {}
+
+        bins, lower, upper = self.buckets()
+        active = np.searchsorted(starts, upper, 'right') - np.searchsorted(ends, lower, 'left')
+        return dict(
+            (bin_label(value, self.granularity), count)
+            for value, count in zip(bins.tolist(), active.tolist())
+        )
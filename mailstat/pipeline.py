@@ -0,0 +1,103 @@
+# mailstat.pipeline
+# Producer/consumer pipeline that reads rows in a background thread
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Thu Jan 09 10:17:52 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: pipeline.py [] benjamin@bengfort.com $
+
+"""
+Producer/consumer pipeline that reads rows in a background thread
+
+A Pipeline wraps any iterable (usually an M3Reader) and consumes it in a
+reader thread that puts batches of items into a bounded queue, while the
+caller iterates over the batches. The bounded queue applies backpressure:
+the reader blocks once `maxsize` batches are waiting. Reading and decoding
+in the thread overlaps with the metric computation in the caller, which
+mostly hides the latency of slow (e.g. network mounted) storage.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import sys
+import threading
+
+from Queue import Queue, Full
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+BATCH_SIZE = 1000
+QUEUE_SIZE = 8
+
+##########################################################################
+## Pipeline
+##########################################################################
+
+class Pipeline(object):
+    """
+    Iterable of batches (lists) of the items of an iterable, which is read
+    by a background thread into a bounded queue.
+    """
+
+    # Sentinel put on the queue by the reader when it is finished
+    DONE = object()
+
+    def __init__(self, iterable, batch_size=BATCH_SIZE, maxsize=QUEUE_SIZE):
+        self.iterable   = iterable
+        self.batch_size = batch_size
+        self.maxsize    = maxsize
+
+    def produce(self, queue, stopped):
+        """
+        Reads the iterable into batches on the queue until it is exhausted
+        or the consumer stops. Exceptions are passed to the consumer.
+        """
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        try:
+            batch = []
+            for item in self.iterable:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    if not put(batch): return
+                    batch = []
+            if batch:
+                put(batch)
+        except Exception:
+            put(sys.exc_info())
+        finally:
+            put(self.DONE)
+
+    def __iter__(self):
+        queue   = Queue(self.maxsize)
+        stopped = threading.Event()
+        reader  = threading.Thread(target=self.produce, args=(queue, stopped))
+        reader.daemon = True
+        reader.start()
+
+        try:
+            while True:
+                batch = queue.get()
+                if batch is self.DONE:
+                    break
+                if isinstance(batch, tuple):
+                    raise batch[0], batch[1], batch[2]
+                yield batch
+        finally:
+            # Unblocks the reader if the consumer stops early
+            stopped.set()
+            reader.join()
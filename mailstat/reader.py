@@ -19,10 +19,26 @@ Wraps the data reading and munging functionality
 
 import os
 import re
+import bz2
+import gzip
 
+import csv as rawcsv
+import numpy as np
 import unicodecsv as csv
-from datetime import datetime
+
+from itertools import islice
+from collections import Mapping
+from mailstat.index import LineIndex
 from mailstat.exceptions import *
+from mailstat.utils.dates import DateParser
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
 
 ##########################################################################
 ## Expected Fields
@@ -47,7 +63,173 @@ FIELDS       = (
     COUNT, FIRST_SEEN, LAST_SEEN,
 )
 
+STRING_FIELDS   = (
+    EMAIL, DISPLAY_NAME, FIRST_NAME, MIDDLE_NAME,
+    LAST_NAME, CITY, REGION, COUNTRY, FACEBOOK,
+)
+INTEGER_FIELDS  = (COUNT,)
+DATETIME_FIELDS = (FIRST_SEEN, LAST_SEEN)
+
 ENCODING     = 'ISO8859'
+DATEFMT      = '%m/%d/%Y %H:%M:%S %p'
+COLUMN_BATCH = 10000
+
+##########################################################################
+## Compression
+##########################################################################
+
+## Compression name, magic bytes and file extensions
+COMPRESSION  = (
+    ('gzip', '\x1f\x8b', ('.gz', '.gzip')),
+    ('bz2',  'BZh', ('.bz2',)),
+    ('xz',   '\xfd7zXZ\x00', ('.xz', '.lzma')),
+)
+
+def detect_compression(path):
+    """
+    Returns the name of the compression of a file by its magic bytes, or
+    else by its extension, None if the file is not compressed.
+    """
+    with open(path, 'rb') as data:
+        head = data.read(6)
+
+    for name, magic, extensions in COMPRESSION:
+        if head.startswith(magic):
+            return name
+
+    for name, magic, extensions in COMPRESSION:
+        if path.lower().endswith(extensions):
+            return name
+
+    return None
+
+##########################################################################
+## Columnar Storage
+##########################################################################
+
+class Categorical(object):
+    """
+    A dictionary encoded string column: every row holds an integer code
+    that indexes into an array of the unique values (categories). Highly
+    repetitive columns like domains or countries are stored once.
+    """
+
+    __slots__ = ('codes', 'categories')
+
+    def __init__(self, codes, categories):
+        self.codes      = codes
+        self.categories = categories
+
+    @classmethod
+    def from_values(cls, values, encoding=None):
+        """
+        Encodes an iterable of strings into a Categorical column. If an
+        encoding is given the values are bytes, and only the unique values
+        are decoded.
+        """
+        index = {}
+        codes = np.fromiter(
+            (index.setdefault(value, len(index)) for value in values),
+            dtype=np.int32
+        )
+        categories = np.empty(len(index), dtype=object)
+        for value, code in index.iteritems():
+            categories[code] = value.decode(encoding) if encoding else value
+        return cls(codes, categories)
+
+    def values(self):
+        """
+        Decodes the column into an object array of strings.
+        """
+        return self.categories[self.codes]
+
+    def __getitem__(self, idx):
+        """
+        Integer indices return a string, slices and masks a Categorical.
+        """
+        if isinstance(idx, (int, long, np.integer)):
+            return self.categories[self.codes[idx]]
+        return Categorical(self.codes[idx], self.categories)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        for code in self.codes:
+            yield self.categories[code]
+
+    def __repr__(self):
+        return "<Categorical (%i rows, %i categories)>" % (len(self), len(self.categories))
+
+##########################################################################
+## Helper Functions
+##########################################################################
+
+def readlines(data, end):
+    """
+    Yields lines from the current position of an open file until the line
+    that begins at or after the `end` byte offset.
+    """
+    while data.tell() < end:
+        line = data.readline()
+        if not line: break
+        yield line
+
+def rows_from_columns(columns, chunk=COLUMN_BATCH):
+    """
+    Yields munged row dicts from the columnar format, converting chunks of
+    each column back to Python types at a time. Missing datetimes become
+    empty strings again as they would be in a munged row.
+    """
+    fields = columns.keys()
+    length = len(columns[fields[0]]) if fields else 0
+
+    for start in xrange(0, length, chunk):
+        values = []
+        for field in fields:
+            column = columns[field][start:start+chunk]
+            if isinstance(column, Categorical):
+                column = column.values()
+            values.append(column.astype(object).tolist())
+
+        for row in zip(*values):
+            row = dict(zip(fields, row))
+            for field in DATETIME_FIELDS:
+                if field in row and row[field] is None:
+                    row[field] = ''
+            yield row
+
+##########################################################################
+## Read-only Rows
+##########################################################################
+
+class FrozenRow(Mapping):
+    """
+    A read-only view of a munged row. Every value in a munged row is an
+    immutable type (strings, ints and datetimes) so a single row can be
+    shared between metrics without copying, as long as no metric is able
+    to assign to it.
+    """
+
+    __slots__ = ('_row',)
+
+    def __init__(self, row):
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._row[key]
+
+    def __iter__(self):
+        return iter(self._row)
+
+    def __len__(self):
+        return len(self._row)
+
+    def __contains__(self, key):
+        return key in self._row
+
+    def __repr__(self):
+        return "FrozenRow(%r)" % self._row
 
 ##########################################################################
 ## Reader Class
@@ -65,11 +247,17 @@ class M3Reader(object):
         Optional Keyword Arguments:
             encoding: encoding of file (default ISO8859)
             datefmt:  format of datetimes
+            cache:    use the on-disk columnar cache (default False)
+            cachedir: directory of the columnar cache
+            fields:   only decode and munge these fields (default all)
         """
         self.path = path
 
         self.encoding = kwargs.get('encoding', ENCODING)
-        self.datefmt  = kwargs.get('datefmt', '%m/%d/%Y %H:%M:%S %p')
+        self.datefmt  = kwargs.get('datefmt', DATEFMT)
+        self.cache    = kwargs.get('cache', False)
+        self.cachedir = kwargs.get('cachedir', None)
+        self.fields   = kwargs.get('fields', None)
 
     @property
     def path(self):
@@ -92,6 +280,54 @@ class M3Reader(object):
             raise ReaderException("No CSV file found at '%s'" % path)
 
         self._path = path
+        self._compression = detect_compression(path)
+
+    @property
+    def compression(self):
+        """
+        The compression of the CSV file (gzip, bz2 or xz), None if plain.
+        """
+        return self._compression
+
+    def open(self):
+        """
+        Opens the CSV file for reading, decompressing it as a stream if it
+        is compressed so that no temporary files are needed.
+        """
+        if self.compression is None:
+            return open(self.path, 'rU')
+
+        if self.compression == 'gzip':
+            return gzip.open(self.path, 'rb')
+
+        if self.compression == 'bz2':
+            return bz2.BZ2File(self.path, 'rb')
+
+        if lzma is None:
+            raise ReaderException(
+                "Reading xz compressed files requires lzma (backports.lzma)"
+            )
+        return lzma.LZMAFile(self.path, 'rb')
+
+    def seekable(self):
+        """
+        Checks that the file supports byte offsets, which compressed files
+        do not, for sharding, indexing and random access.
+        """
+        if self.compression is not None:
+            raise ReaderException(
+                "Byte offsets are not supported on %s compressed files" % self.compression
+            )
+
+    @property
+    def dateparser(self):
+        """
+        A memoized, compiled parser for the current `datefmt`
+        """
+        parser = getattr(self, '_dateparser', None)
+        if parser is None or parser.fmt != self.datefmt:
+            parser = self._dateparser = DateParser(self.datefmt)
+        return parser
 
     def munge(self, row):
         """
@@ -102,36 +338,287 @@ class M3Reader(object):
         """
 
         converters = (
-            (FIRST_SEEN, lambda x: datetime.strptime(x, self.datefmt)),
-            (LAST_SEEN,  lambda x: datetime.strptime(x, self.datefmt)),
+            (FIRST_SEEN, self.dateparser),
+            (LAST_SEEN,  self.dateparser),
             (COUNT,      lambda x: int(x)),
         )
 
         for key, func in converters:
             # TODO: Remove and raise exception on validation error
-            if row[key]:
+            if row.get(key):
                 row[key] = func(row[key])
 
         return row
 
+    def read(self, data, fieldnames=None):
+        """
+        Parses and munges rows from an iterable of CSV lines; the first line
+        is the header unless the fieldnames are given. If the reader has a
+        projection of fields, only those fields are decoded, munged and
+        returned in each row, the rest of the line is never decoded.
+        """
+        if self.fields is None:
+            reader = csv.DictReader(data, fieldnames=fieldnames, encoding=self.encoding)
+            for row in reader:
+                yield self.munge(row)
+            return
+
+        reader = rawcsv.reader(data)
+        if fieldnames is None:
+            fieldnames = [name.decode(self.encoding) for name in reader.next()]
+
+        index = []
+        for field in self.fields:
+            if field not in fieldnames:
+                raise ReaderException("Field '%s' not found in CSV header" % field)
+            index.append((field, fieldnames.index(field)))
+
+        encoding = self.encoding
+        for values in reader:
+            count = len(values)
+            yield self.munge(dict(
+                (field, values[idx].decode(encoding) if idx < count else None)
+                for field, idx in index
+            ))
+
+    def to_columns(self):
+        """
+        Loads the entire CSV file into a columnar, in-memory format: a dict
+        that maps each of the expected FIELDS to a NumPy array. Datetimes
+        are stored as datetime64 (NaT if missing), counts as int64 (0 if
+        missing) and all string fields as Categorical columns.
+
+        If the cache is enabled, the columns are memory mapped from a valid
+        cache entry instead, or the cache is written after parsing. If the
+        reader has a projection of fields, only those columns are returned.
+        """
+        if not self.cache:
+            return self.parse_columns(self.fields)
+
+        # Imported here since the cache module depends on the reader
+        from mailstat.cache import ColumnCache
+
+        # The cache always holds every field so it serves any projection
+        cache   = ColumnCache(self.path, self.cachedir, encoding=self.encoding, datefmt=self.datefmt)
+        columns = cache.load()
+        if columns is None:
+            cache.save(self.parse_columns(FIELDS))
+            columns = cache.load()
+
+        self._lines = len(columns[EMAIL])
+        if self.fields is not None:
+            columns = dict((field, columns[field]) for field in self.fields)
+        return columns
+
+    def parse_columns(self, fields=None):
+        """
+        Parses the CSV file into columns for the given fields (default all),
+        see `to_columns`.
+        """
+        fields = FIELDS if fields is None else fields
+        with self.open() as data:
+            reader = rawcsv.reader(data)
+            header = self.header(reader.next(), fields)
+            self._lines, columns = self.columnize(reader, header, fields)
+        return columns
+
+    def iter_columns(self, batch_size=COLUMN_BATCH, start=None, end=None):
+        """
+        Iterates over the rows in column oriented batches of at most
+        `batch_size` rows, in the format of `to_columns`. If a byte range is
+        given, only the rows whose lines begin in [start, end) are read.
+        """
+        fields = FIELDS if self.fields is None else self.fields
+
+        if self.cache and start is None:
+            columns = self.to_columns()
+            for offset in xrange(0, len(self), batch_size):
+                yield dict(
+                    (field, column[offset:offset+batch_size])
+                    for field, column in columns.iteritems()
+                )
+            return
+
+        if start is None:
+            data = self.open()
+        else:
+            self.seekable()
+            data = open(self.path, 'rb')
+
+        with data:
+            if start is None:
+                reader = rawcsv.reader(data)
+                header = self.header(reader.next(), fields)
+            else:
+                header = self.header(rawcsv.reader([data.readline()]).next(), fields)
+                data.seek(start)
+                reader = rawcsv.reader(readlines(data, end))
+
+            while True:
+                batch = list(islice(reader, batch_size))
+                if not batch: break
+                yield self.columnize(batch, header, fields)[1]
+
+    def header(self, names, fields):
+        """
+        Maps the fields to their index in the (undecoded) header row of the
+        CSV file.
+        """
+        header = dict((name.decode(self.encoding), idx) for idx, name in enumerate(names))
+        for field in fields:
+            if field not in header:
+                raise ReaderException("Field '%s' not found in CSV header" % field)
+        return header
+
+    def columnize(self, rows, header, fields):
+        """
+        Converts the given fields of an iterable of CSV rows (lists of byte
+        strings) into columns; strings are only decoded once per unique
+        value. Returns the number of rows and columns.
+        """
+        strings   = dict((field, []) for field in STRING_FIELDS if field in fields)
+        integers  = dict((field, []) for field in INTEGER_FIELDS if field in fields)
+        datetimes = dict((field, []) for field in DATETIME_FIELDS if field in fields)
+        parse     = self.dateparser
+
+        # Only the values go into lists, repeated strings are shared
+        # through a per-column intern table until they are encoded.
+        interns = dict((field, {}) for field in strings)
+
+        count = 0
+        for row in rows:
+            count += 1
+            for field in strings:
+                value = row[header[field]]
+                strings[field].append(interns[field].setdefault(value, value))
+
+            for field in integers:
+                value = row[header[field]]
+                integers[field].append(int(value) if value else 0)
+
+            for field in datetimes:
+                value = row[header[field]]
+                datetimes[field].append(
+                    parse(value) if value else None
+                )
+
+        columns = {}
+        for field, values in strings.iteritems():
+            columns[field] = Categorical.from_values(values, self.encoding)
+        for field, values in integers.iteritems():
+            columns[field] = np.array(values, dtype=np.int64)
+        for field, values in datetimes.iteritems():
+            columns[field] = np.array(values, dtype='datetime64[s]')
+
+        return count, columns
+
     def __iter__(self):
         """
-        Iterable for rows in CSV file, also counts rows for len.
+        Iterable for rows in CSV file, also counts rows for len. If the
+        cache is enabled the rows are read from the cached columns.
         """
-        with open(self.path, 'rU') as data:
-            reader = csv.DictReader(data, encoding=self.encoding)
+        if self.cache:
+            for row in rows_from_columns(self.to_columns()):
+                yield row
+            return
+
+        with self.open() as data:
             self._lines = 0
-            for row in reader:
+            for row in self.read(data):
                 self._lines += 1
-                yield self.munge(row)
+                yield row
+
+    def data_offset(self):
+        """
+        The byte offset of the first row, just after the header line.
+        """
+        self.seekable()
+        with open(self.path, 'rb') as data:
+            data.readline()
+            return data.tell()
+
+    def shards(self, count):
+        """
+        Splits the body of the CSV file (everything after the header) into
+        at most `count` byte ranges of roughly equal size, returned as a
+        list of (start, end) offsets that always fall on line boundaries.
+
+        Note: rows with quoted newlines are not supported by sharding.
+        """
+        self.seekable()
+        size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as data:
+            data.readline()
+            bounds = [data.tell()]
+            for idx in xrange(1, count):
+                offset = size * idx // count
+                if offset <= bounds[-1]: continue
+
+                # Seek to the end of the line that contains the offset
+                data.seek(offset - 1)
+                data.readline()
+                if bounds[-1] < data.tell() < size:
+                    bounds.append(data.tell())
+            bounds.append(size)
+
+        return [
+            (start, end) for start, end in zip(bounds, bounds[1:])
+            if start < end
+        ]
+
+    def iter_range(self, start, end):
+        """
+        Iterates over the munged rows whose lines begin in the byte range
+        [start, end) of the CSV file, as computed by `shards`.
+        """
+        self.seekable()
+        with open(self.path, 'rb') as data:
+            fieldnames = csv.reader([data.readline()], encoding=self.encoding).next()
+            data.seek(start)
+
+            for row in self.read(readlines(data, end), fieldnames):
+                yield row
+
+    @property
+    def index(self):
+        """
+        The line-offset index of the CSV file, loaded from the sidecar file
+        or built on first access.
+        """
+        if not hasattr(self, '_index'):
+            self.seekable()
+            self._index = LineIndex.open(self.path)
+        return self._index
+
+    def __getitem__(self, idx):
+        """
+        Random access to the munged row at an index, or a list of the rows
+        in a slice, using the line-offset index to seek to the rows.
+        """
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if start >= stop:
+                return []
+            rows = list(self.iter_range(*self.index.span(start, stop)))
+            return rows[::step]
+
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("M3Reader index out of range")
+        return self.iter_range(*self.index.span(idx, idx+1)).next()
 
     def __len__(self):
         """
-        If iteration has alreadyrun, returns the number of lines, else will
-        iterate through the CSV file to determine its length.
+        If iteration has already run, returns the number of lines, else
+        uses the line-offset index to determine its length. Compressed
+        files have no index and are iterated through instead.
         """
         if not hasattr(self, '_lines'):
-            for row in self: continue
+            if self.compression is not None:
+                for row in self: continue
+            else:
+                self._lines = len(self.index)
         return self._lines
 
     def __str__(self):
@@ -18,3 +18,6 @@ This module generates HTML reports for analytics
 ##########################################################################
 
 from base import *
+from tables import *
+from fragments import *
+from writers import *
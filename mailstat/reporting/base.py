@@ -11,17 +11,80 @@
 
 """
 Code for the creation of Reports
+
+All reports share a single Jinja2 Environment per process, so that every
+template is compiled at most once. Compiled bytecode is also cached on
+disk (in ~/.mailstat/bytecode or $MAILSTAT_BYTECODE) for other processes,
+and the templates can be precompiled into Python modules at install time
+with `compile_templates` (or `bin/m3stat precompile`).
 """
 
 ##########################################################################
 ## Imports
 ##########################################################################
 
+import os
 import six
 
-from jinja2 import Environment, PackageLoader
+from jinja2 import Environment, ChoiceLoader, PackageLoader, ModuleLoader
+from jinja2 import FileSystemBytecodeCache
 from mailstat.exceptions import ImproperlyConfigured
 
+##########################################################################
+## Module Constants
+##########################################################################
+
+BYTECODE_DIR = os.environ.get('MAILSTAT_BYTECODE', os.path.join('~', '.mailstat', 'bytecode'))
+COMPILED_DIR = os.path.join(os.path.dirname(__file__), 'compiled')
+
+##########################################################################
+## Template Environment
+##########################################################################
+
+def create_environment(cachedir=BYTECODE_DIR, compiled=COMPILED_DIR):
+    """
+    Creates a Jinja2 Environment for the package templates. Precompiled
+    templates in the compiled directory are preferred if it exists (so it
+    must be recompiled when the templates change); otherwise templates are
+    compiled from source, with bytecode cached in the cachedir if given.
+    """
+    loaders = [PackageLoader('mailstat.reporting', 'templates')]
+    if compiled and os.path.isdir(compiled):
+        loaders.insert(0, ModuleLoader(compiled))
+
+    bytecode = None
+    if cachedir:
+        cachedir = os.path.abspath(os.path.expanduser(cachedir))
+        try:
+            if not os.path.isdir(cachedir):
+                os.makedirs(cachedir)
+            bytecode = FileSystemBytecodeCache(cachedir)
+        except OSError:
+            # An unwritable cache only costs recompiling the templates
+            bytecode = None
+
+    return Environment(loader=ChoiceLoader(loaders), bytecode_cache=bytecode)
+
+_environment = None
+
+def get_environment():
+    """
+    Returns the Environment shared by all reports in this process.
+    """
+    global _environment
+    if _environment is None:
+        _environment = create_environment()
+    return _environment
+
+def compile_templates(target=COMPILED_DIR):
+    """
+    Precompiles the package templates into Python modules in the target
+    directory, which the shared Environment loads instead of the sources.
+    """
+    environment = create_environment(cachedir=None, compiled=None)
+    environment.compile_templates(target, zip=None, ignore_errors=False)
+    return target
+
 ##########################################################################
 ## Report Object
 ##########################################################################
@@ -45,12 +108,9 @@ class Report(object):
     @property
     def environment(self):
         """
-        The Jinja2 Environment and Template Loader
+        The Jinja2 Environment and Template Loader, shared by all reports
         """
-        if not hasattr(self, '_environment'):
-            loader=PackageLoader('mailstat.reporting', 'templates')
-            self._environment = Environment(loader=loader)
-        return self._environment
+        return get_environment()
 
     def render(self, path, **kwargs):
         """
@@ -59,7 +119,7 @@ class Report(object):
         """
         context  = self.get_context_data(**kwargs)
         template = self.get_template()
-        template.stream(context).dump(path)
+        template.stream(context).dump(path, encoding='utf-8')
 
     def get_template(self):
         """
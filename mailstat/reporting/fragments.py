@@ -0,0 +1,179 @@
+# mailstat.reporting.fragments
+# A persistent cache of rendered report sections
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Mon Jan 27 09:44:31 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: fragments.py [] benjamin@bengfort.com $
+
+"""
+A persistent cache of rendered report sections
+
+Reports that are regenerated regularly mostly contain metrics whose values
+have not changed. Each rendered section is cached on disk (in
+~/.mailstat/fragments or $MAILSTAT_FRAGMENTS) under a digest of the
+template source and of the value that feeds it, so that only the sections
+of changed values are rendered again.
+
+Every report records the keys of the sections it used in a manifest named
+by the digest of its output path, and fragments that no manifest refers
+to any more are deleted, so the cache only holds the current sections of
+the reports that are regenerated.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import json
+import codecs
+import hashlib
+import tempfile
+
+from jinja2 import PackageLoader
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+FRAGMENTS_DIR = os.environ.get('MAILSTAT_FRAGMENTS', os.path.join('~', '.mailstat', 'fragments'))
+
+##########################################################################
+## Helper Functions
+##########################################################################
+
+def value_digest(value, default=None):
+    """
+    SHA1 hex digest of the compact JSON of a value. Keys are not sorted,
+    which would disable the C encoder: equal dicts that iterate in another
+    order only cost a cache miss, never a stale hit.
+    """
+    encoded = json.dumps(value, separators=(',', ':'), default=default)
+    return hashlib.sha1(encoded.encode('utf8') if isinstance(encoded, unicode) else encoded).hexdigest()
+
+def template_digest(environment, name):
+    """
+    SHA1 hex digest of the source of a package template, so that changes
+    to the template invalidate its fragments.
+    """
+    loader = PackageLoader('mailstat.reporting', 'templates')
+    source = loader.get_source(environment, name)[0]
+    return hashlib.sha1(source.encode('utf8')).hexdigest()
+
+##########################################################################
+## Fragment Cache
+##########################################################################
+
+class FragmentCache(object):
+    """
+    Rendered HTML fragments stored as files named by their key, with the
+    manifests of the reports that use them in a manifests subdirectory.
+    """
+
+    def __init__(self, cachedir=None):
+        self.cachedir = os.path.abspath(os.path.expanduser(cachedir or FRAGMENTS_DIR))
+        self.hits     = 0
+        self.misses   = 0
+
+    def key(self, *parts):
+        """
+        The cache key of the digests (or other strings) of a fragment.
+        """
+        return hashlib.sha1("\0".join(parts)).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cachedir, key + ".html")
+
+    @property
+    def manifests(self):
+        return os.path.join(self.cachedir, "manifests")
+
+    def get(self, key):
+        """
+        Returns the cached fragment, or None on a miss.
+        """
+        try:
+            with codecs.open(self.path(key), 'r', encoding='utf8') as fragment:
+                html = fragment.read()
+        except IOError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return html
+
+    def set(self, key, html):
+        """
+        Atomically writes a fragment, so readers never see partial files.
+        """
+        if not os.path.isdir(self.cachedir):
+            os.makedirs(self.cachedir)
+
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.cachedir)
+        with os.fdopen(fd, 'wb') as fragment:
+            fragment.write(html.encode('utf8'))
+        os.rename(tmp, self.path(key))
+
+    def manifest(self, report, keys):
+        """
+        Records the keys of the fragments used by a report (any name that
+        identifies it, e.g. its output path), replacing its previous
+        manifest, then prunes the fragments no report uses any more.
+        """
+        if not os.path.isdir(self.manifests):
+            os.makedirs(self.manifests)
+
+        name = hashlib.sha1(os.path.abspath(report)).hexdigest() + ".json"
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.manifests)
+        with os.fdopen(fd, 'wb') as manifest:
+            json.dump(sorted(set(keys)), manifest)
+        os.rename(tmp, os.path.join(self.manifests, name))
+
+        self.prune()
+
+    def referenced(self):
+        """
+        The set of keys listed in any manifest.
+        """
+        keys = set()
+        if not os.path.isdir(self.manifests): return keys
+        for name in os.listdir(self.manifests):
+            if name.endswith(".json"):
+                with open(os.path.join(self.manifests, name)) as manifest:
+                    keys.update(json.load(manifest))
+        return keys
+
+    def prune(self):
+        """
+        Deletes the fragments that no manifest refers to and returns how
+        many were deleted.
+        """
+        if not os.path.isdir(self.cachedir): return 0
+        keys    = self.referenced()
+        deleted = 0
+        for name in os.listdir(self.cachedir):
+            if name.endswith(".html") and name[:-5] not in keys:
+                try:
+                    os.remove(os.path.join(self.cachedir, name))
+                    deleted += 1
+                except OSError:
+                    # Removed by a concurrent prune
+                    continue
+        return deleted
+
+    def clear(self):
+        """
+        Deletes every cached fragment and manifest.
+        """
+        if not os.path.isdir(self.cachedir): return
+        for name in os.listdir(self.cachedir):
+            if name.endswith(".html"):
+                os.remove(os.path.join(self.cachedir, name))
+        if not os.path.isdir(self.manifests): return
+        for name in os.listdir(self.manifests):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.manifests, name))
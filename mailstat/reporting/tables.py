@@ -0,0 +1,182 @@
+# mailstat.reporting.tables
+# Streaming and paginated reports of large tables
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Wed Jan 22 09:37:26 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: tables.py [] benjamin@bengfort.com $
+
+"""
+Streaming and paginated reports of large tables
+
+Metric values such as the full domain distribution can have millions of
+rows. A TableReport renders rows from any iterable (e.g. a generator over
+the metric value) without collecting them: the template consumes the rows
+one at a time and is written to disk in chunks, optionally split across
+numbered pages with an index page, so memory does not grow with the table.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+
+from jinja2 import Markup
+from itertools import islice
+from mailstat.reporting.base import Report
+
+##########################################################################
+## Pages
+##########################################################################
+
+class Page(object):
+    """
+    A page of rows for the table template. The rows are a generator over
+    the shared iterator of the table, so `has_next` (and `count`) are only
+    known once the rows of the page have been rendered.
+    """
+
+    def __init__(self, pager, number):
+        self.pager  = pager
+        self.number = number
+        self.count  = 0
+
+    @property
+    def paginated(self):
+        return self.pager.page_size is not None
+
+    @property
+    def index(self):
+        return self.pager.link(None)
+
+    def link(self, number):
+        return self.pager.link(number)
+
+    @property
+    def rows(self):
+        limit = self.pager.page_size
+        for row in islice(self.pager, limit):
+            self.count += 1
+            yield row
+
+    def has_next(self):
+        return self.pager.peek()
+
+class Pager(object):
+    """
+    Iterates over the rows of a table with one row of look ahead, and
+    names the page files after the index file, e.g. domains-2.html.
+    """
+
+    def __init__(self, rows, page_size, path):
+        self.rows      = iter(rows)
+        self.page_size = page_size
+        self.base, self.ext = os.path.splitext(os.path.basename(path))
+        self.pending   = []
+
+    def peek(self):
+        """
+        True if there are more rows.
+        """
+        if not self.pending:
+            try:
+                self.pending.append(next(self.rows))
+            except StopIteration:
+                return False
+        return True
+
+    def link(self, number):
+        """
+        The relative link to a page, or to the index if number is None.
+        """
+        if number is None:
+            return self.base + self.ext
+        return "%s-%i%s" % (self.base, number, self.ext)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self.pending:
+            return self.pending.pop()
+        return next(self.rows)
+
+##########################################################################
+## Table Links
+##########################################################################
+
+class TableLink(object):
+    """
+    Stands in for a table in another report: renders as a link to the
+    table's `href` that gives its number of rows.
+    """
+
+    def __init__(self, href, total):
+        self.href  = href
+        self.total = total
+
+    def __html__(self):
+        return Markup(u'<a href="%s">%i rows</a>') % (self.href, self.total)
+
+##########################################################################
+## Table Report
+##########################################################################
+
+class TableReport(Report):
+    """
+    Renders the `rows` (an iterable of sequences) of a table with the
+    given `columns` headers. With a `page_size` the path is an index page
+    that links to pages of at most `page_size` rows each; otherwise the
+    whole table is streamed into the one file. Output is buffered in
+    chunks of `chunk_size` template events between writes.
+    """
+
+    template_name       = "table.html"
+    index_template_name = "table_index.html"
+
+    title      = None
+    columns    = ()
+    rows       = ()
+    page_size  = None
+    chunk_size = 100
+
+    def render(self, path, **kwargs):
+        """
+        Renders the table (and the index if paginated), returns the paths
+        of the files that were written.
+        """
+        pager = Pager(kwargs.pop('rows', self.rows), self.page_size, path)
+        if self.page_size is None:
+            self.stream(self.get_template(), path, page=Page(pager, 1), **kwargs)
+            return [path]
+
+        pages, total, paths = [], 0, []
+        dirname = os.path.dirname(path)
+        while not pages or pager.peek():
+            page  = Page(pager, len(pages) + 1)
+            paths.append(os.path.join(dirname, pager.link(page.number)))
+            self.stream(self.get_template(), paths[-1], page=page, **kwargs)
+
+            pages.append({
+                'number': page.number, 'href': pager.link(page.number),
+                'first': total + 1, 'last': total + page.count,
+            })
+            total += page.count
+
+        index = self.environment.get_template(self.index_template_name)
+        self.stream(index, path, pages=pages, total=total, **kwargs)
+        return [path] + paths
+
+    def stream(self, template, path, **kwargs):
+        """
+        Streams a template to the path in chunks.
+        """
+        kwargs.setdefault('title', self.title)
+        kwargs.setdefault('columns', self.columns)
+        stream = template.stream(self.get_context_data(**kwargs))
+        stream.enable_buffering(self.chunk_size)
+        stream.dump(path, encoding='utf-8')
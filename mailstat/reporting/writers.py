@@ -0,0 +1,341 @@
+# mailstat.reporting.writers
+# Writes the results of an analysis in several formats at once
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Thu Jan 23 09:58:14 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: writers.py [] benjamin@bengfort.com $
+
+"""
+Writes the results of an analysis in several formats at once
+
+Every writer takes the serialized values of an analysis (the dict of the
+metric names to their values, or an iterable of (name, value) pairs such
+as Analysis.iterserialize) and a path. The analysis is serialized once
+and all of the writers are run concurrently in a thread pool, so that the
+rendering of one format overlaps with the file I/O of the others.
+
+Formats: html, json (compact, streamed a metric at a time), csv (a flat
+summary), npz (columnar NumPy arrays) and msgpack, which requires the
+optional msgpack package.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import re
+import json
+import numpy as np
+import unicodecsv as csv
+
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
+from mailstat.exceptions import ImproperlyConfigured
+from mailstat.reporting.base import Report
+from mailstat.reporting.tables import TableReport, TableLink
+from mailstat.reporting.fragments import value_digest, template_digest
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+##########################################################################
+## Helper Functions
+##########################################################################
+
+def json_default(obj):
+    """
+    Converts the NumPy scalars and arrays and the datetimes that metrics
+    may report to JSON-native values.
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError("%r is not JSON serializable" % obj)
+
+def items(values):
+    """
+    The (name, value) pairs of a dict or an iterable of pairs.
+    """
+    if isinstance(values, dict):
+        return values.iteritems()
+    return values
+
+def native(value):
+    """
+    Converts a nested value to JSON-native types: dicts (with defaultdicts
+    as plain dicts), lists, unicode strings, numbers, booleans and None.
+    """
+    if isinstance(value, dict):
+        return dict((native(key), native(item)) for key, item in value.iteritems())
+    if isinstance(value, (list, tuple)):
+        return [native(item) for item in value]
+    if isinstance(value, str):
+        return value.decode('utf8')
+    if isinstance(value, (np.generic, np.ndarray, datetime)):
+        return native(json_default(value))
+    return value
+
+def flatten(value, prefix=()):
+    """
+    Yields (path, scalar) pairs of a nested value, where the path is the
+    tuple of the keys (or list indices) that lead to the scalar.
+    """
+    if isinstance(value, dict):
+        for key in sorted(value):
+            for pair in flatten(value[key], prefix + (key,)):
+                yield pair
+    elif isinstance(value, (list, tuple)):
+        for idx, item in enumerate(value):
+            for pair in flatten(item, prefix + (idx,)):
+                yield pair
+    else:
+        yield prefix, value
+
+##########################################################################
+## Analysis Report
+##########################################################################
+
+class AnalysisReport(Report):
+    """
+    HTML report of the values of every metric of an analysis, rendered
+    with a section (partials/metric.html) per metric.
+
+    With a FragmentCache as `fragments`, every section is rendered on its
+    own and cached under the digest of its metric's value, and the report
+    is assembled from the sections, so only changed metrics are rendered.
+    The keys of the sections are then recorded as the report's manifest,
+    which prunes the fragments of values that are no longer reported.
+
+    Flat mappings (at any depth of a value) with more than `table_size`
+    entries, such as the domain distribution or daily time series, are
+    rendered as TableReports of `page_size` rows per page next to the
+    report (e.g. report-domain-distribution.html) and linked in place.
+    """
+
+    template_name    = "report.html"
+    section_template = "partials/metric.html"
+
+    title      = "Email Analytics"
+    source     = None
+    values     = None
+    fragments  = None
+    table_size = 100
+    page_size  = 500
+
+    def render(self, path, **kwargs):
+        self.path = path
+        self.keys = []
+        super(AnalysisReport, self).render(path, **kwargs)
+        if self.fragments is not None:
+            self.fragments.manifest(path, self.keys)
+
+    def table_path(self, *names):
+        """
+        The path of the table of a metric or of a mapping within it.
+        """
+        base, ext = os.path.splitext(self.path)
+        slug = re.sub(r'[^a-z0-9]+', '-', u"-".join(map(unicode, names)).lower().encode('ascii', 'ignore'))
+        return "%s-%s%s" % (base, slug.strip('-'), ext)
+
+    def tabulate(self, value, names, render=True):
+        """
+        Returns the value with its large flat mappings replaced by links to
+        their tables, which are rendered unless `render` is False and the
+        table already exists.
+        """
+        if not isinstance(value, dict):
+            return value
+
+        flat = not any(isinstance(item, (dict, list, tuple)) for item in value.itervalues())
+        if not flat:
+            return dict((key, self.tabulate(item, names + (key,), render)) for key, item in value.iteritems())
+        if len(value) <= self.table_size:
+            return value
+
+        path = self.table_path(*names)
+        if render or not os.path.exists(path):
+            table = TableReport(title=u" / ".join(map(unicode, names)), columns=(u"Key", u"Value"), page_size=self.page_size)
+            table.render(path, rows=sorted(value.iteritems()))
+        return TableLink(os.path.basename(path), len(value))
+
+    def get_sections(self, metrics):
+        """
+        Yields the rendered section of every (name, value) of the metrics,
+        from the fragment cache if the value has been rendered before.
+        """
+        template = self.environment.get_template(self.section_template)
+        version  = template_digest(self.environment, self.section_template)
+
+        tables   = "%s\0%i\0%i" % (os.path.basename(self.path), self.table_size, self.page_size)
+
+        for name, value in metrics:
+            key  = self.fragments.key(version, tables, name.encode('utf8'), value_digest(value, json_default))
+            self.keys.append(key)
+            html = self.fragments.get(key)
+            if html is None:
+                html = template.render(name=name, value=self.tabulate(value, (name,)))
+                self.fragments.set(key, html)
+            else:
+                # Only restores tables that have been deleted
+                self.tabulate(value, (name,), render=False)
+            yield html
+
+    def get_context_data(self, **kwargs):
+        kwargs.setdefault('title', self.title)
+        kwargs.setdefault('source', self.source)
+        kwargs.setdefault('generated', datetime.now().strftime("%Y-%m-%d %H:%M"))
+        kwargs.setdefault('metrics', sorted((self.values or {}).items()))
+        if self.fragments is not None:
+            kwargs.setdefault('sections', self.get_sections(kwargs['metrics']))
+        else:
+            kwargs['metrics'] = [(name, self.tabulate(value, (name,))) for name, value in kwargs['metrics']]
+        return super(AnalysisReport, self).get_context_data(**kwargs)
+
+##########################################################################
+## Writers
+##########################################################################
+
+def write_html(values, path, **kwargs):
+    """
+    Renders the HTML report of the values.
+    """
+    AnalysisReport(values=dict(items(values)), **kwargs).render(path)
+
+def write_json(values, path, indent=None, **kwargs):
+    """
+    Streams a JSON object of the values, encoding one metric at a time
+    (with the C encoder, which `iterencode` would not use). The output is
+    compact unless an indent is given.
+    """
+    separators = (',', ':') if indent is None else (',', ': ')
+    encoder    = json.JSONEncoder(indent=indent, separators=separators, default=json_default)
+
+    with open(path, 'w') as outfile:
+        outfile.write('{')
+        for idx, (name, value) in enumerate(items(values)):
+            if idx: outfile.write(',')
+            outfile.write(encoder.encode(name))
+            outfile.write(':')
+            outfile.write(encoder.encode(value))
+        outfile.write('}')
+
+def write_csv(values, path, **kwargs):
+    """
+    Writes a summary of the values with a row per scalar in each metric,
+    keyed by the path of the scalar in the metric's value.
+    """
+    with open(path, 'wb') as outfile:
+        writer = csv.writer(outfile, encoding='utf8')
+        writer.writerow(("metric", "key", "value"))
+        for name, value in sorted(items(values)):
+            for keys, scalar in flatten(native(value)):
+                writer.writerow((name, u"/".join(map(unicode, keys)), scalar))
+
+def write_npz(values, path, **kwargs):
+    """
+    Writes the values as columns in a NumPy .npz archive: for every metric
+    `<name>/keys` holds the (slash joined) paths of its scalars and
+    `<name>/values` the scalars, as float64 if they are all numbers and as
+    unicode otherwise, so they load without unpickling.
+    """
+    columns = {}
+    for name, value in items(values):
+        scalars = np.array(value.values()) if isinstance(value, dict) else None
+        if scalars is not None and scalars.ndim == 1 and scalars.dtype.kind != 'O':
+            # Flat mappings (e.g. distributions) are the common, large case
+            keys = map(unicode, value.iterkeys())
+        else:
+            pairs   = list(flatten(native(value)))
+            keys    = [u"/".join(map(unicode, key)) for key, _ in pairs]
+            scalars = np.array([scalar for _, scalar in pairs])
+
+        if scalars.dtype.kind in 'iuf':
+            scalars = scalars.astype(np.float64)
+        else:
+            scalars = np.array([u"" if scalar is None else unicode(scalar) for scalar in scalars.tolist()], dtype=np.unicode_)
+
+        columns[name + "/keys"]   = np.array(keys, dtype=np.unicode_)
+        columns[name + "/values"] = scalars
+
+    with open(path, 'wb') as outfile:
+        np.savez(outfile, **columns)
+
+def write_msgpack(values, path, **kwargs):
+    """
+    Writes the values as a MessagePack map, packing one metric at a time.
+    """
+    if msgpack is None:
+        raise ImproperlyConfigured(
+            "Writing MessagePack requires the msgpack package"
+        )
+
+    values = list(items(values))
+    packer = msgpack.Packer(use_bin_type=True)
+    with open(path, 'wb') as outfile:
+        outfile.write(packer.pack_map_header(len(values)))
+        for name, value in values:
+            outfile.write(packer.pack(native(name)))
+            outfile.write(packer.pack(native(value)))
+
+WRITERS = {
+    'html':    write_html,
+    'json':    write_json,
+    'csv':     write_csv,
+    'npz':     write_npz,
+    'msgpack': write_msgpack,
+}
+
+def output_paths(output, formats):
+    """
+    The path of every format: the output path itself if it is a single
+    format and the output has an extension, otherwise the output with
+    the extension of each format. Raises ImproperlyConfigured for unknown
+    formats and formats whose optional package is missing, so that the
+    output can be validated before the analysis is run.
+    """
+    for fmt in formats:
+        if fmt not in WRITERS:
+            raise ImproperlyConfigured(
+                "Unknown format '%s', use one of %s" % (fmt, ", ".join(sorted(WRITERS)))
+            )
+        if fmt == 'msgpack' and msgpack is None:
+            raise ImproperlyConfigured(
+                "Writing MessagePack requires the msgpack package"
+            )
+
+    base, ext = os.path.splitext(output)
+    if len(formats) == 1 and ext:
+        return {formats[0]: output}
+    return dict((fmt, "%s.%s" % (base, fmt)) for fmt in formats)
+
+def write_all(values, paths, **kwargs):
+    """
+    Runs the writer of every format in `paths` (a dict of formats to the
+    output paths) concurrently in a thread pool, reraising any error. An
+    iterable of values is only streamed directly to a single writer.
+    """
+    if len(paths) != 1:
+        values = dict(items(values))
+
+    pool = ThreadPool(max(len(paths), 1))
+    try:
+        results = [
+            pool.apply_async(WRITERS[fmt], (values, path), kwargs)
+            for fmt, path in paths.iteritems()
+        ]
+        for result in results:
+            result.get()
+    finally:
+        pool.close()
+        pool.join()
+    return paths
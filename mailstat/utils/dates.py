@@ -0,0 +1,195 @@
+# mailstat.utils.dates
+# Fast, format specialized parsing of timestamps
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Mon Jan 06 09:31:18 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: dates.py [] benjamin@bengfort.com $
+
+"""
+Fast, format specialized parsing of timestamps
+
+`datetime.strptime` rebuilds its state on every call and is the largest
+CPU cost of reading MineMyMail exports. A DateParser compiles a format
+string into a single regular expression once, constructs datetimes
+directly from the matched groups, and memoizes repeated timestamp strings.
+Formats with directives that it does not know fall back to strptime. The
+results are identical to strptime; in particular an hour given with %I is
+always on the 12 hour clock (12 is midnight without a %p) and %p is
+ignored unless the hour is given with %I, exactly as strptime does.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import re
+
+from datetime import datetime
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+MEMO_SIZE  = 8192
+
+DIRECTIVES = {
+    'Y': r'(\d{4})',
+    'y': r'(\d{2})',
+    'm': r'(1[0-2]|0[1-9]|[1-9])',
+    'd': r'(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])',
+    'H': r'(2[0-3]|[0-1]\d|\d)',
+    'I': r'(1[0-2]|0[1-9]|[1-9])',
+    'M': r'([0-5]\d|\d)',
+    'S': r'(6[0-1]|[0-5]\d|\d)',
+    'f': r'(\d{1,6})',
+    'p': r'(am|pm)',
+}
+
+##########################################################################
+## Helper Functions
+##########################################################################
+
+def compile_format(fmt):
+    """
+    Compiles a strptime format into a regular expression and the ordered
+    list of directives its groups capture. Returns (None, None) if the
+    format contains a directive that is not supported or is repeated.
+    """
+    pattern    = []
+    directives = []
+
+    idx = 0
+    while idx < len(fmt):
+        char = fmt[idx]
+        if char == '%':
+            if idx + 1 >= len(fmt):
+                return None, None
+
+            directive = fmt[idx+1]
+            idx += 2
+
+            if directive == '%':
+                pattern.append('%')
+            elif directive in DIRECTIVES and directive not in directives:
+                pattern.append(DIRECTIVES[directive])
+                directives.append(directive)
+            else:
+                return None, None
+        elif char.isspace():
+            # Like strptime, whitespace matches any run of whitespace
+            while idx < len(fmt) and fmt[idx].isspace():
+                idx += 1
+            pattern.append(r'\s+')
+        else:
+            pattern.append(re.escape(char))
+            idx += 1
+
+    # Both hour directives are ambiguous, leave them to strptime
+    if 'H' in directives and 'I' in directives:
+        return None, None
+
+    regex = re.compile(''.join(pattern) + r'\Z', re.IGNORECASE)
+    return regex, directives
+
+##########################################################################
+## Date Parser
+##########################################################################
+
+class DateParser(object):
+    """
+    Callable that parses timestamp strings with a fixed format.
+
+    The memo is a bounded, two generation approximation of an LRU cache:
+    hits are plain dict lookups, misses are promoted from the older
+    generation, and the older generation is discarded when the newer one
+    is full, so at most `memo` timestamps are ever held.
+    """
+
+    def __init__(self, fmt, memo=MEMO_SIZE):
+        self.fmt  = fmt
+        self.memo = memo
+        self.regex, self.directives = compile_format(fmt)
+        self.clear()
+
+    @property
+    def compiled(self):
+        """
+        True if the format is parsed by the fast path, not strptime.
+        """
+        return self.regex is not None
+
+    def clear(self):
+        """
+        Empties the memo of parsed timestamps.
+        """
+        self._recent = {}
+        self._older  = {}
+
+    def __call__(self, value):
+        try:
+            return self._recent[value]
+        except KeyError:
+            pass
+
+        if value in self._older:
+            parsed = self._older.pop(value)
+        else:
+            parsed = self.parse(value)
+
+        if len(self._recent) >= self.memo // 2:
+            self._older  = self._recent
+            self._recent = {}
+
+        self._recent[value] = parsed
+        return parsed
+
+    def parse(self, value):
+        """
+        Parses a timestamp without the memo.
+        """
+        if self.regex is None:
+            return datetime.strptime(value, self.fmt)
+
+        match = self.regex.match(value)
+        if match is None:
+            # Raises the same ValueError that callers expect from strptime
+            return datetime.strptime(value, self.fmt)
+
+        parts = dict(zip(self.directives, match.groups()))
+
+        if 'Y' in parts:
+            year = int(parts['Y'])
+        elif 'y' in parts:
+            year = int(parts['y'])
+            year = year + 1900 if year >= 69 else year + 2000
+        else:
+            year = 1900
+
+        hour = int(parts.get('H') or parts.get('I') or 0)
+        if 'I' in parts:
+            hour = hour % 12
+            if parts.get('p', '').lower() == 'pm':
+                hour += 12
+
+        return datetime(
+            year,
+            int(parts.get('m', 1)),
+            int(parts.get('d', 1)),
+            hour,
+            int(parts.get('M', 0)),
+            int(parts.get('S', 0)),
+            int(parts['f'].ljust(6, '0')) if 'f' in parts else 0,
+        )
+
+    def __getstate__(self):
+        """
+        The memo is not pickled when parsers are sent to other processes.
+        """
+        state = self.__dict__.copy()
+        state['_recent'] = {}
+        state['_older']  = {}
+        return state
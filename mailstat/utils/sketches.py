@@ -0,0 +1,326 @@
+# mailstat.utils.sketches
+# Probabilistic data structures for bounded memory metrics
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Mon Jan 13 09:48:15 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: sketches.py [] benjamin@bengfort.com $
+
+"""
+Probabilistic data structures for bounded memory metrics
+
+Sketches summarize very large streams in a fixed amount of memory and can
+be merged, so that sharded (parallel) and incremental analyses can combine
+their partial results. All sketches take NumPy arrays of values so that
+metrics can update them a batch at a time.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import math
+import hashlib
+import numpy as np
+
+from mailstat.exceptions import ImproperlyConfigured
+
+##########################################################################
+## Hashing
+##########################################################################
+
+def hash64(values):
+    """
+    Hashes an iterable of strings to an array of unsigned 64-bit integers,
+    using the first 8 bytes of the MD5 digest of their UTF-8 encoding.
+    """
+    digests = ''.join(
+        hashlib.md5(value.encode('utf8') if isinstance(value, unicode) else value).digest()[:8]
+        for value in values
+    )
+    return np.frombuffer(digests, dtype='<u8').astype(np.uint64)
+
+def bit_length(values):
+    """
+    Number of bits needed to represent each unsigned 64-bit integer, which
+    is computed on 32-bit halves so that the float log2 is exact.
+    """
+    values = values.astype(np.uint64)
+    high   = (values >> np.uint64(32)).astype(np.float64)
+    low    = (values & np.uint64(0xffffffff)).astype(np.float64)
+
+    with np.errstate(divide='ignore'):
+        bits = np.where(
+            high > 0,
+            32 + np.floor(np.log2(np.maximum(high, 1))) + 1,
+            np.where(low > 0, np.floor(np.log2(np.maximum(low, 1))) + 1, 0)
+        )
+    return bits.astype(np.int64)
+
+##########################################################################
+## HyperLogLog
+##########################################################################
+
+class HyperLogLog(object):
+    """
+    Estimates the number of distinct values in a stream with 2**precision
+    one byte registers; the relative standard error is 1.04/sqrt(2**p).
+    """
+
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ImproperlyConfigured("HyperLogLog precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def size(self):
+        return len(self.registers)
+
+    @property
+    def error(self):
+        """
+        The relative standard error of the estimate.
+        """
+        return 1.04 / math.sqrt(self.size)
+
+    def add(self, values):
+        """
+        Adds an iterable of string values to the sketch.
+        """
+        self.add_hashes(hash64(values))
+
+    def add_hashes(self, hashes):
+        """
+        Adds 64-bit hashes: the first p bits select a register, which keeps
+        the maximum rank (position of the first 1 bit) of the other bits.
+        """
+        if not len(hashes): return
+
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        rest  = hashes & np.uint64((1 << width) - 1)
+        ranks = (width - bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, ranks)
+
+    def estimate(self):
+        """
+        The HyperLogLog estimate, with linear counting for small ranges.
+        """
+        size  = float(self.size)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(self.size, 0.7213 / (1 + 1.079 / size))
+        raw   = alpha * size * size / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+
+        zeros = np.count_nonzero(self.registers == 0)
+        if raw <= 2.5 * size and zeros:
+            return size * math.log(size / zeros)
+        return raw
+
+    def merge(self, other):
+        """
+        Merges another sketch with the same precision into this one.
+        """
+        if other.precision != self.precision:
+            raise ImproperlyConfigured("Cannot merge HyperLogLogs with different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def __len__(self):
+        return int(round(self.estimate()))
+
+##########################################################################
+## Count-Min Sketch
+##########################################################################
+
+class CountMinSketch(object):
+    """
+    Approximate frequencies of a stream in a fixed `depth` x `width` table
+    of counters. Estimates never undercount, and overcount by at most
+    e/width of the total count with probability 1 - exp(-depth).
+    """
+
+    def __init__(self, width=16384, depth=4):
+        if width < 1 or depth < 1:
+            raise ImproperlyConfigured("Count-Min Sketch dimensions must be positive")
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def indices(self, hashes):
+        """
+        The column of each hash in every row, by double hashing the two
+        32-bit halves of the 64-bit hashes.
+        """
+        low  = (hashes & np.uint64(0xffffffff)).astype(np.int64)
+        high = (hashes >> np.uint64(32)).astype(np.int64)
+        return [(low + row * high) % self.width for row in xrange(self.depth)]
+
+    def add(self, values, counts=1):
+        """
+        Adds counts (a scalar or an array) for an iterable of string values.
+        """
+        self.update(values, counts)
+
+    def update(self, values, counts=1):
+        """
+        Adds counts like add and returns the new estimated counts of the
+        values, hashing them only once.
+        """
+        hashes  = hash64(values)
+        columns = self.indices(hashes)
+        counts  = np.broadcast_to(np.asarray(counts, dtype=np.int64), hashes.shape)
+        for row, cols in enumerate(columns):
+            np.add.at(self.table[row], cols, counts)
+        self.total += int(counts.sum())
+
+        if not len(hashes):
+            return np.zeros(0, dtype=np.int64)
+        return np.min([self.table[row, cols] for row, cols in enumerate(columns)], axis=0)
+
+    def query(self, values):
+        """
+        Returns the estimated counts of an iterable of string values.
+        """
+        hashes  = hash64(values)
+        if not len(hashes):
+            return np.zeros(0, dtype=np.int64)
+
+        columns = self.indices(hashes)
+        return np.min([self.table[row, cols] for row, cols in enumerate(columns)], axis=0)
+
+    def merge(self, other):
+        """
+        Merges another sketch with the same dimensions into this one.
+        """
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ImproperlyConfigured("Cannot merge Count-Min Sketches with different dimensions")
+        self.table += other.table
+        self.total += other.total
+
+##########################################################################
+## T-Digest
+##########################################################################
+
+class TDigest(object):
+    """
+    Approximate quantiles of a stream of numbers, kept as at most about
+    2 x `compression` weighted centroids. Centroids are small near the tails
+    (q near 0 or 1) and large near the median, so extreme quantiles such
+    as p99 stay accurate. Values are buffered and merged in sorted batches.
+    """
+
+    def __init__(self, compression=100, buffer_size=None):
+        if compression < 10:
+            raise ImproperlyConfigured("T-Digest compression must be at least 10")
+        self.compression = compression
+        self.buffer_size = buffer_size or 5 * compression
+        self.means   = np.zeros(0, dtype=np.float64)
+        self.weights = np.zeros(0, dtype=np.float64)
+        self.buffer  = []
+        self.buffered = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    @property
+    def count(self):
+        """
+        The total weight of the values added to the digest.
+        """
+        self.compress()
+        return int(round(self.weights.sum()))
+
+    @property
+    def size(self):
+        """
+        The number of centroids after compressing the buffer.
+        """
+        self.compress()
+        return len(self.means)
+
+    def add(self, values, weights=None):
+        """
+        Adds an array of values (with optional weights) to the digest. The
+        buffer is compressed after every `buffer_size` values, no matter
+        how they were batched, so the digest only depends on their order.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if not len(values): return
+
+        if weights is None:
+            weights = np.ones(len(values), dtype=np.float64)
+        weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), values.shape)
+
+        self.minimum = min(self.minimum, values.min())
+        self.maximum = max(self.maximum, values.max())
+
+        while len(values):
+            split = self.buffer_size - self.buffered
+            self.buffer.append((values[:split], weights[:split]))
+            self.buffered += len(values[:split])
+            values, weights = values[split:], weights[split:]
+            if self.buffered >= self.buffer_size:
+                self.compress()
+
+    def compress(self):
+        """
+        Merges the buffer into the centroids: all points are sorted and
+        grouped by the integer part of the k1 scale function at the start
+        of each point, k(q) = compression * (asin(2q - 1) / pi + 1/2), so
+        that no centroid spans more than one unit of k, unless it is a
+        single point (or earlier centroid) that already does.
+        """
+        if not self.buffer: return
+
+        means   = np.concatenate([self.means] + [values for values, _ in self.buffer])
+        weights = np.concatenate([self.weights] + [weights for _, weights in self.buffer])
+        self.buffer   = []
+        self.buffered = 0
+
+        order   = np.argsort(means, kind='mergesort')
+        means   = means[order]
+        weights = weights[order]
+
+        cumulative = np.cumsum(weights)
+        scale  = lambda q: self.compression * (np.arcsin(2 * np.clip(q, 0, 1) - 1) / np.pi + 0.5)
+        start  = scale((cumulative - weights) / cumulative[-1])
+        groups = np.floor(start)
+
+        # A point that alone spans past its unit of k stays a centroid
+        alone  = scale(cumulative / cumulative[-1]) > groups + 1
+        bounds = np.flatnonzero(np.r_[True, (groups[1:] != groups[:-1]) | alone[1:] | alone[:-1]])
+
+        self.weights = np.add.reduceat(weights, bounds)
+        self.means   = np.add.reduceat(means * weights, bounds) / self.weights
+
+    def quantile(self, q):
+        """
+        Estimates the q quantile(s), interpolating between the centers of
+        the centroids and the exact minimum and maximum.
+        """
+        self.compress()
+        if not len(self.means):
+            return np.full(np.shape(q), np.nan)
+
+        total   = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2.0
+        points  = np.r_[0.0, centers, total]
+        values  = np.r_[self.minimum, self.means, self.maximum]
+        return np.interp(np.asarray(q, dtype=np.float64) * total, points, values)
+
+    def merge(self, other):
+        """
+        Merges another digest into this one by adding its centroids.
+        """
+        other.compress()
+        if len(other.means):
+            self.buffer.append((other.means, other.weights))
+            self.minimum = min(self.minimum, other.minimum)
+            self.maximum = max(self.maximum, other.maximum)
+            self.compress()
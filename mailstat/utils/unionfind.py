@@ -0,0 +1,89 @@
+# mailstat.utils.unionfind
+# A disjoint set forest for clustering linked items
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Fri Jan 17 09:31:02 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: unionfind.py [] benjamin@bengfort.com $
+
+"""
+A disjoint set forest for clustering linked items
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+from collections import defaultdict
+
+##########################################################################
+## Union Find
+##########################################################################
+
+class UnionFind(object):
+    """
+    Disjoint sets of hashable items with union by size and path halving,
+    so that any sequence of unions and finds takes nearly linear time.
+    Items are added to the forest as singletons the first time they are
+    seen by find or union.
+    """
+
+    def __init__(self, items=()):
+        self.parents = {}
+        self.sizes   = {}
+        for item in items:
+            self.find(item)
+
+    def find(self, item):
+        """
+        Returns the representative of the set that contains the item.
+        """
+        parents = self.parents
+        if item not in parents:
+            parents[item] = item
+            self.sizes[item] = 1
+            return item
+
+        while parents[item] != item:
+            parents[item] = parents[parents[item]]
+            item = parents[item]
+        return item
+
+    def union(self, first, second):
+        """
+        Joins the sets of both items, returns False if they were joined.
+        """
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return False
+
+        if self.sizes[first] < self.sizes[second]:
+            first, second = second, first
+
+        self.parents[second] = first
+        self.sizes[first] += self.sizes.pop(second)
+        return True
+
+    def connected(self, first, second):
+        return self.find(first) == self.find(second)
+
+    def sets(self):
+        """
+        Returns a list of the sets, each a list of its items.
+        """
+        sets = defaultdict(list)
+        for item in self.parents:
+            sets[self.find(item)].append(item)
+        return sets.values()
+
+    def __contains__(self, item):
+        return item in self.parents
+
+    def __len__(self):
+        """
+        The number of disjoint sets.
+        """
+        return len(self.sizes)
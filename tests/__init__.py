@@ -17,7 +17,28 @@ Tests for the mailstat package
 ## Imports
 ##########################################################################
 
+import shutil
+import tempfile
+
 from unittest import TestCase
+from mailstat.reporting import base
+
+##########################################################################
+## Package Fixtures
+##########################################################################
+
+def setup_package():
+    """
+    Reports rendered by the tests cache their bytecode in a temporary
+    directory rather than in the user's ~/.mailstat/bytecode
+    """
+    global BYTECODE_DIR
+    BYTECODE_DIR = tempfile.mkdtemp()
+    base._environment = base.create_environment(cachedir=BYTECODE_DIR)
+
+def teardown_package():
+    base._environment = None
+    shutil.rmtree(BYTECODE_DIR)
 
 ##########################################################################
 ## TestCase
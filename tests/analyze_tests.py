@@ -1,17 +1,173 @@
-# pkg.mod
-# descr
+# tests.analyze_tests
+# Tests for the Analysis harness
 #
 # Author:   Benjamin Bengfort <benjamin@bengfort.com>
-# Created:  timestamp
+# Created:  Sun Dec 29 23:45:58 2013 -0600
 #
 # Copyright (C) 2013 Bengfort.com
 # For license information, see LICENSE.txt
 #
-# ID: __init__.py [] benjamin@bengfort.com $
+# ID: analyze_tests.py [] benjamin@bengfort.com $
 
 """
+Tests for the Analysis harness
 """
 
 ##########################################################################
 ## Imports
 ##########################################################################
+
+import os
+import gzip
+import shutil
+import unittest
+import tempfile
+
+from mailstat.analyze import *
+from mailstat.metric import Metric
+from mailstat.reader import EMAIL, COUNT, FrozenRow
+
+##########################################################################
+## Helper Metrics
+##########################################################################
+
+class MutatingMetric(Metric):
+    """
+    A badly behaved metric that attempts to modify the rows
+    """
+
+    name = "Mutating Metric"
+
+    def preprocess(self):
+        self.errors = 0
+
+    def process(self, row):
+        try:
+            row[EMAIL] = None
+        except TypeError:
+            self.errors += 1
+
+    def get_value(self):
+        return self.errors
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class AnalysisTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.fixture = os.path.join(tdir, "fixtures/emailmetrics.csv")
+
+    def test_analyze(self):
+        """
+        Assert the analysis harness runs the default metrics
+        """
+        analysis = Analysis(self.fixture)
+        analysis.analyze()
+        result   = analysis.serialize()
+
+        self.assertIn(DomainDistribution.name, result)
+        self.assertEqual(1430, sum(result[DomainDistribution.name].values()))
+
+    def test_rows_are_read_only(self):
+        """
+        Check that metrics cannot modify the shared rows
+        """
+        analysis = Analysis(self.fixture, metrics=[MutatingMetric, DomainDistribution])
+        analysis.analyze()
+        result   = analysis.serialize()
+
+        self.assertEqual(1430, result[MutatingMetric.name])
+        self.assertEqual(1430, sum(result[DomainDistribution.name].values()))
+
+    def test_frozen_row(self):
+        """
+        Test the FrozenRow mapping interface
+        """
+        row = FrozenRow({'a': 1, 'b': 2})
+        self.assertEqual(1, row['a'])
+        self.assertEqual(2, row.get('b'))
+        self.assertIn('a', row)
+        self.assertEqual(2, len(row))
+        with self.assertRaises(TypeError):
+            row['c'] = 3
+
+    def test_parallel_analyze(self):
+        """
+        Assert parallel analysis matches the serial analysis
+        """
+        serial   = Analysis(self.fixture)
+        serial.analyze()
+
+        parallel = Analysis(self.fixture, workers=3)
+        parallel.analyze()
+
+        self.assertEqual(
+            dict(serial.serialize()[DomainDistribution.name]),
+            dict(parallel.serialize()[DomainDistribution.name])
+        )
+
+    def test_parallel_requires_merge(self):
+        """
+        Check that parallel analysis requires mergeable metrics
+        """
+        analysis = Analysis(self.fixture, metrics=[MutatingMetric], workers=2)
+        with self.assertRaises(ImproperlyConfigured):
+            analysis.analyze()
+
+    def test_serial_only_options(self):
+        """
+        Assert workers are rejected for cached or compressed datasets
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            Analysis(self.fixture, workers=2, cache=True).analyze()
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "emailmetrics.csv.gz")
+            with open(self.fixture, 'rb') as src, gzip.open(path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            with self.assertRaises(ImproperlyConfigured):
+                Analysis(path, workers=2).analyze()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_fields_projection(self):
+        """
+        Check the union of the metric fields is passed to the reader
+        """
+        analysis = Analysis(self.fixture, metrics=[DomainDistribution])
+        self.assertEqual((EMAIL,), analysis.fields)
+        self.assertEqual((EMAIL,), analysis.dataset.fields)
+
+        analysis = Analysis(self.fixture, metrics=[DomainDistribution, MostFrequentCorrespondents])
+        self.assertEqual((EMAIL, COUNT), analysis.fields)
+
+        analysis = Analysis(self.fixture, metrics=[MutatingMetric, DomainDistribution])
+        self.assertIsNone(analysis.fields)
+        self.assertIsNone(analysis.dataset.fields)
+
+    def test_pipeline_analyze(self):
+        """
+        Assert pipelined analysis matches the serial analysis
+        """
+        serial   = Analysis(self.fixture)
+        serial.analyze()
+
+        pipeline = Analysis(self.fixture, pipeline=True, batch_size=100)
+        pipeline.analyze()
+
+        self.assertEqual(serial.serialize(), pipeline.serialize())
+
+    def test_iterserialize(self):
+        """
+        Check the streamed values match the serialized values
+        """
+        analysis = Analysis(self.fixture, metrics=[DomainDistribution, MostFrequentCorrespondents])
+        analysis.analyze()
+
+        pairs = analysis.iterserialize()
+        self.assertEqual(DomainDistribution.name, next(pairs)[0])
+        self.assertEqual(analysis.serialize(), dict(analysis.iterserialize()))
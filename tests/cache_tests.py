@@ -0,0 +1,133 @@
+# tests.cache_tests
+# Tests for the persistent column cache
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Sun Jan 05 10:48:02 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: cache_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the persistent column cache
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from mailstat.cache import *
+from mailstat.reader import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class ColumnCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.cachedir = tempfile.mkdtemp(prefix="mailstat-cache-")
+        self.fixture  = os.path.join(self.cachedir, "emailmetrics.csv")
+        shutil.copy(os.path.join(tdir, "fixtures/emailmetrics.csv"), self.fixture)
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir)
+
+    def test_empty_cache(self):
+        """
+        Check that a missing cache entry is invalid
+        """
+        cache = ColumnCache(self.fixture, self.cachedir)
+        self.assertFalse(cache.is_valid())
+        self.assertIsNone(cache.load())
+
+    def test_save_and_load(self):
+        """
+        Assert the cached columns match the parsed columns
+        """
+        columns = M3Reader(self.fixture).to_columns()
+        cache   = ColumnCache(self.fixture, self.cachedir)
+        cache.save(columns)
+
+        self.assertTrue(cache.is_valid())
+        cached  = cache.load()
+        self.assertEqual(set(columns.keys()), set(cached.keys()))
+        self.assertTrue(isinstance(cached[EMAIL], Categorical))
+        self.assertEqual(list(columns[EMAIL]), list(cached[EMAIL]))
+        self.assertTrue(np.array_equal(columns[COUNT], cached[COUNT]))
+
+    def test_invalidate_on_change(self):
+        """
+        Check that modifying the CSV file invalidates the cache
+        """
+        reader  = M3Reader(self.fixture, cache=True, cachedir=self.cachedir)
+        reader.to_columns()
+
+        cache   = ColumnCache(self.fixture, self.cachedir)
+        self.assertTrue(cache.is_valid())
+
+        with open(self.fixture, 'a') as data:
+            data.write("new.person@gmail.com,New Person,New,,Person,,,,,1,,\n")
+        self.assertFalse(cache.is_valid())
+        self.assertEqual(1431, len(reader.to_columns()[EMAIL]))
+
+    def test_cached_rows(self):
+        """
+        Assert the reader yields the same rows from the cache
+        """
+        reader = M3Reader(self.fixture)
+        cached = M3Reader(self.fixture, cache=True, cachedir=self.cachedir)
+        for row, other in zip(reader, cached):
+            self.assertEqual(row[EMAIL], other[EMAIL])
+            self.assertEqual(row[FIRST_SEEN], other[FIRST_SEEN])
+            self.assertEqual(row[LAST_SEEN], other[LAST_SEEN])
+        self.assertEqual(len(reader), len(cached))
+
+    def test_parsing_options(self):
+        """
+        Check the cache is not shared by readers with other date formats
+        """
+        M3Reader(self.fixture, cache=True, cachedir=self.cachedir).to_columns()
+        self.assertTrue(ColumnCache(self.fixture, self.cachedir).is_valid())
+        self.assertFalse(ColumnCache(self.fixture, self.cachedir, datefmt="%d/%m/%Y %H:%M:%S %p").is_valid())
+        self.assertFalse(ColumnCache(self.fixture, self.cachedir, encoding="utf8").is_valid())
+
+        reader = M3Reader(self.fixture, cache=True, cachedir=self.cachedir, datefmt="%d/%m/%Y %H:%M:%S %p")
+        with self.assertRaises(ValueError):
+            reader.to_columns()
+
+    def test_encoded_strings(self):
+        """
+        Assert categories are stored as UTF-8 and decoded when indexed
+        """
+        strings = EncodedStrings.encode([u"", u"b\xfccher.de", u"gmail.com"])
+        self.assertEqual(3, len(strings))
+        self.assertEqual(len(u"b\xfccher.de".encode('utf8')) + 9, len(strings.data))
+        self.assertEqual(u"b\xfccher.de", strings[1])
+        self.assertEqual(u"gmail.com", strings[-1])
+        self.assertEqual([u"gmail.com", u"", u"gmail.com"], strings[np.array([2, 0, 2])].tolist())
+        self.assertEqual([u"b\xfccher.de", u"gmail.com"], strings[1:].tolist())
+
+    def test_compact_categories(self):
+        """
+        Check the cached categories are no larger than their text
+        """
+        columns = M3Reader(self.fixture).to_columns()
+        cache   = ColumnCache(self.fixture, self.cachedir)
+        cache.save(columns)
+
+        emails  = cache.load()[EMAIL]
+        self.assertEqual(
+            sum(len(email.encode('utf8')) for email in columns[EMAIL].categories),
+            len(emails.categories.data)
+        )
+        self.assertEqual(list(columns[EMAIL].values()), list(emails.values()))
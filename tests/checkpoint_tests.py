@@ -0,0 +1,113 @@
+# tests.checkpoint_tests
+# Tests for incremental analysis with checkpoints
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Sat Jan 11 14:32:09 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: checkpoint_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for incremental analysis with checkpoints
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mailstat.analyze import *
+from mailstat.checkpoint import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class IncrementalAnalysisTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        with open(os.path.join(tdir, "fixtures/emailmetrics.csv"), 'rb') as data:
+            self.lines = data.readlines()
+
+        self.tmpdir     = tempfile.mkdtemp(prefix="mailstat-")
+        self.path       = os.path.join(self.tmpdir, "emails.csv")
+        self.checkpoint = os.path.join(self.tmpdir, "emails.ckpt")
+        self.expected   = self.analyze(self.lines, checkpoint=None)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def analyze(self, lines, mode='wb', checkpoint=True):
+        with open(self.path, mode) as data:
+            data.writelines(lines)
+
+        checkpoint = self.checkpoint if checkpoint else None
+        analysis   = Analysis(self.path, checkpoint=checkpoint)
+        analysis.analyze()
+        return dict(analysis.serialize()[DomainDistribution.name])
+
+    def test_appended_rows(self):
+        """
+        Assert only appended rows are processed after a checkpoint
+        """
+        self.analyze(self.lines[:700])
+        self.assertEqual(
+            Checkpoint.load(self.checkpoint).offset,
+            sum(len(line) for line in self.lines[:700])
+        )
+        self.assertEqual(self.expected, self.analyze(self.lines[700:], 'ab'))
+        self.assertEqual(self.expected, self.analyze([], 'ab'))
+
+    def test_partial_row(self):
+        """
+        Check a row that is still being written is not processed
+        """
+        last = self.lines[-1]
+        self.analyze(self.lines[:-1] + [last[:10]])
+        self.assertEqual(self.expected, self.analyze([last[10:]], 'ab'))
+
+    def test_rewritten_file(self):
+        """
+        Check that a rewritten file is analyzed from the beginning
+        """
+        self.analyze(self.lines[:700])
+        lines = [self.lines[0]] + self.lines[:699:-1]
+        self.assertEqual(
+            sum(self.expected.values()) - 699, sum(self.analyze(lines).values())
+        )
+
+    def test_unsupported_options(self):
+        """
+        Assert options that incremental analysis ignores are rejected
+        """
+        for options in ({'workers': 2}, {'pipeline': True}, {'cache': True}):
+            with self.assertRaises(ImproperlyConfigured):
+                Analysis(self.path, checkpoint=self.checkpoint, **options).analyze()
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_changed_parameters(self):
+        """
+        Assert a checkpoint is not restored into reconfigured metrics
+        """
+        def analyze(lines, mode, metric):
+            with open(self.path, mode) as data:
+                data.writelines(lines)
+            Analysis(self.path, checkpoint=self.checkpoint, metrics=[metric]).analyze()
+            return metric
+
+        analyze(self.lines[:700], 'wb', MostFrequentCorrespondents(k=10))
+        metric = analyze(self.lines[700:], 'ab', MostFrequentCorrespondents(k=3, mode='spacesaving'))
+
+        expected = MostFrequentCorrespondents(k=3, mode='spacesaving')
+        Analysis(self.path, metrics=[expected]).analyze()
+
+        self.assertEqual({'k': 3, 'mode': 'spacesaving'}, metric.get_params())
+        self.assertEqual(expected.get_value(), metric.get_value())
+        self.assertNotIn('k', Checkpoint.load(self.checkpoint).states[metric.get_name()])
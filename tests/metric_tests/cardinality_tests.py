@@ -0,0 +1,77 @@
+# tests.metric_tests.cardinality_tests
+# Tests for the distinct count metrics
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Mon Jan 13 13:40:18 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: cardinality_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the distinct count metrics
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import unittest
+import numpy as np
+
+from mailstat.reader import *
+from mailstat.metric.cardinality import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class DistinctCountTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.fixture = os.path.join(tdir, "../fixtures/emailmetrics.csv")
+        self.rows    = list(M3Reader(self.fixture))
+
+    def test_estimates(self):
+        """
+        Check the estimates are within the reported bounds
+        """
+        exact = {
+            DistinctCorrespondents: set(r[EMAIL] for r in self.rows),
+            DistinctDomains: set(r[EMAIL].split('@')[1] for r in self.rows),
+            DistinctDisplayNames: set(r[DISPLAY_NAME] for r in self.rows if r[DISPLAY_NAME]),
+        }
+
+        for klass, values in exact.iteritems():
+            metric = klass()
+            metric.preprocess()
+            for row in self.rows:
+                metric.process(row)
+
+            value = metric.get_value()
+            self.assertLessEqual(value['lower'], len(values))
+            self.assertGreaterEqual(value['upper'], len(values))
+
+    def test_batches_and_merge(self):
+        """
+        Assert batches and merged shards build the same sketch as rows
+        """
+        rows = DistinctDomains()
+        rows.preprocess()
+        for row in self.rows:
+            rows.process(row)
+
+        reader  = M3Reader(self.fixture)
+        merged  = DistinctDomains()
+        merged.preprocess()
+        for batch in reader.iter_columns(400):
+            metric = DistinctDomains()
+            metric.preprocess()
+            metric.process_batch(batch)
+            merged.merge(metric)
+
+        self.assertTrue(np.array_equal(rows.sketch.registers, merged.sketch.registers))
+        self.assertEqual(rows.get_value(), merged.get_value())
@@ -0,0 +1,114 @@
+# tests.metric_tests.counts_tests
+# Tests for the counting metrics
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Sun Jan 12 11:05:47 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: counts_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the counting metrics
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import unittest
+
+from mailstat.reader import *
+from mailstat.exceptions import *
+from mailstat.metric.counts import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class MostFrequentCorrespondentsTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.fixture = os.path.join(tdir, "../fixtures/emailmetrics.csv")
+        self.rows    = list(M3Reader(self.fixture))
+        self.top     = sorted(
+            ((row[COUNT], row[EMAIL]) for row in self.rows if row[COUNT]), reverse=True
+        )
+
+    def run_rows(self, metric, rows):
+        metric.preprocess()
+        for row in rows:
+            metric.process(row)
+        return metric
+
+    def test_bad_mode(self):
+        """
+        Check an unknown mode is improperly configured
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            MostFrequentCorrespondents(mode='exact')
+
+    def test_heap(self):
+        """
+        Assert the heap mode computes the exact top k
+        """
+        metric = self.run_rows(MostFrequentCorrespondents(k=25), self.rows)
+        value  = metric.get_value()
+        self.assertEqual(25, len(value))
+        self.assertEqual([c for c, e in self.top[:25]], [v['count'] for v in value])
+
+    def test_heap_batches_and_merge(self):
+        """
+        Check batches and merged shards give the same top k as rows
+        """
+        expected = self.run_rows(MostFrequentCorrespondents(), self.rows).get_value()
+
+        metric = MostFrequentCorrespondents()
+        metric.preprocess()
+        for batch in M3Reader(self.fixture).iter_columns(300):
+            metric.process_batch(batch)
+        self.assertEqual(expected, metric.get_value())
+
+        metric = self.run_rows(MostFrequentCorrespondents(), self.rows[:600])
+        metric.merge(self.run_rows(MostFrequentCorrespondents(), self.rows[600:]))
+        self.assertEqual(expected, metric.get_value())
+
+    def test_spacesaving(self):
+        """
+        Assert Space-Saving finds the heavy hitters with repeated addresses
+        """
+        # Every row appears three times, addresses also repeat in the fixture
+        rows   = self.rows * 3
+        totals = {}
+        for row in rows:
+            totals[row[EMAIL]] = totals.get(row[EMAIL], 0) + (row[COUNT] or 0)
+
+        metric = self.run_rows(MostFrequentCorrespondents(k=50, mode='spacesaving'), rows)
+        value  = metric.get_value()
+        top    = sorted(totals.iteritems(), key=lambda item: item[1], reverse=True)
+
+        self.assertEqual(50, len(metric.counters))
+        self.assertLessEqual(len(metric.heap), 200)
+        for item, (email, count) in zip(value[:5], top[:5]):
+            self.assertEqual(email, item['email'])
+            self.assertLessEqual(count, item['count'])
+            self.assertLessEqual(item['count'] - item['error'], count)
+
+    def test_spacesaving_merge(self):
+        """
+        Check merged Space-Saving summaries keep the heavy hitters
+        """
+        metric = self.run_rows(MostFrequentCorrespondents(k=50, mode='spacesaving'), self.rows)
+        other  = MostFrequentCorrespondents(k=50, mode='spacesaving')
+        other.preprocess()
+        for batch in M3Reader(self.fixture).iter_columns(500):
+            other.process_batch(batch)
+
+        metric.merge(other)
+        value  = metric.get_value()
+        self.assertEqual(50, len(value))
+        self.assertEqual(self.top[0][1], value[0]['email'])
+        self.assertLessEqual(2 * self.top[0][0], value[0]['count'])
@@ -0,0 +1,131 @@
+# tests.metric_tests.domains_tests
+# Tests for the domain metrics
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Fri Jan 10 09:12:40 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: domains_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the domain metrics
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import unittest
+
+from mailstat.reader import *
+from mailstat.metric.domains import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class DomainDistributionTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.fixture = os.path.join(tdir, "../fixtures/emailmetrics.csv")
+
+    def test_batched(self):
+        """
+        Assert the metric implements the batch hook
+        """
+        self.assertTrue(DomainDistribution().batched)
+
+    def test_process_batch(self):
+        """
+        Check the vectorized distribution matches the row distribution
+        """
+        rows = DomainDistribution()
+        rows.preprocess()
+        for row in M3Reader(self.fixture):
+            rows.process(row)
+
+        batches = DomainDistribution()
+        batches.preprocess()
+        for batch in M3Reader(self.fixture).iter_columns(100):
+            batches.process_batch(batch)
+
+        self.assertEqual(dict(rows.get_value()), dict(batches.get_value()))
+
+    def test_merge(self):
+        """
+        Test merging two domain distributions
+        """
+        reader = M3Reader(self.fixture)
+        metric = DomainDistribution()
+        other  = DomainDistribution()
+        for instance in (metric, other):
+            instance.preprocess()
+            instance.process_batch(reader.to_columns())
+
+        metric.merge(other)
+        self.assertEqual(2860, sum(metric.get_value().values()))
+
+    def test_sketch_mode(self):
+        """
+        Check the sketch mode reports the heavy hitters in fixed memory
+        """
+        exact = DomainDistribution()
+        exact.preprocess()
+        exact.process_batch(M3Reader(self.fixture).to_columns())
+        exact = exact.get_value()
+
+        metric = DomainDistribution(sketch=True, width=64, depth=4, top=5)
+        metric.preprocess()
+        for batch in M3Reader(self.fixture).iter_columns(100):
+            metric.process_batch(batch)
+
+        value = metric.get_value()
+        top   = sorted(exact, key=exact.get, reverse=True)[:5]
+        self.assertEqual(5, len(value))
+        self.assertEqual(64 * 4 * 8, metric.counts.nbytes)
+        self.assertEqual(set(top[:3]), set(sorted(value, key=value.get, reverse=True)[:3]))
+        for domain, count in value.iteritems():
+            self.assertGreaterEqual(count, exact[domain])
+
+    def test_sketch_rows(self):
+        """
+        Check rows in sketch mode report the same heavy hitters as batches
+        """
+        reader  = M3Reader(self.fixture)
+        batched = DomainDistribution(sketch=True, width=64, depth=4, top=5)
+        batched.preprocess()
+        batched.process_batch(reader.to_columns())
+
+        rows = DomainDistribution(sketch=True, width=64, depth=4, top=5)
+        rows.preprocess()
+        for row in reader:
+            rows.process(row)
+
+        # Domains tied for the last place may differ, their counts may not
+        expected, value = batched.get_value(), rows.get_value()
+        self.assertEqual(sorted(expected.values()), sorted(value.values()))
+        for domain in set(expected) & set(value):
+            self.assertEqual(expected[domain], value[domain])
+
+    def test_sketch_merge(self):
+        """
+        Assert merged sketches match the sketch of the whole dataset
+        """
+        reader = M3Reader(self.fixture)
+        whole  = DomainDistribution(sketch=True, top=10)
+        whole.preprocess()
+        whole.process_batch(reader.to_columns())
+
+        merged = DomainDistribution(sketch=True, top=10)
+        merged.preprocess()
+        for batch in reader.iter_columns(500):
+            metric = DomainDistribution(sketch=True, top=10)
+            metric.preprocess()
+            metric.process_batch(batch)
+            merged.merge(metric)
+
+        self.assertEqual(dict(whole.get_value()), dict(merged.get_value()))
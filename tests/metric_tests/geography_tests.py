@@ -0,0 +1,111 @@
+# tests.metric_tests.geography_tests
+# Tests for the geographic distribution metric
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Mon Jan 20 10:48:09 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: geography_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the geographic distribution metric
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import unittest
+
+from collections import Counter
+from mailstat.reader import *
+from mailstat.metric.geography import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class GeographicDistributionTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.fixture = os.path.join(tdir, "../fixtures/emailmetrics.csv")
+
+    def metric(self):
+        metric = GeographicDistribution()
+        metric.preprocess()
+        return metric
+
+    def test_rollups(self):
+        """
+        Check the nested counts at every level of the hierarchy
+        """
+        rows   = list(M3Reader(self.fixture))
+        metric = self.metric()
+        for batch in M3Reader(self.fixture).iter_columns(100):
+            metric.process_batch(batch)
+
+        value = metric.get_value()
+        self.assertEqual(len(rows), sum(country['count'] for country in value.values()))
+
+        states = Counter(row[REGION] or UNKNOWN for row in rows if row[COUNTRY] == u'United States')
+        usa    = value[u'United States']
+        self.assertEqual(sum(states.values()), usa['count'])
+        self.assertEqual(dict(states), dict((k, v['count']) for k, v in usa['regions'].items()))
+        self.assertEqual(3, usa['regions'][u'District of Columbia']['cities'][u'Washington'])
+        self.assertIn(UNKNOWN, value)
+
+    def test_interning(self):
+        """
+        Assert every place name is stored once in the intern table
+        """
+        metric = self.metric()
+        for row in M3Reader(self.fixture):
+            metric.process(row)
+
+        self.assertEqual(len(set(metric.names)), len(metric.names))
+        for name, ident in metric.ids.items():
+            self.assertIs(name, metric.names[ident])
+
+    def test_too_many_names(self):
+        """
+        Assert ids that do not fit the packed keys are counted as tuples
+        """
+        from mailstat.metric import geography
+
+        reader = M3Reader(self.fixture)
+        rows   = self.metric()
+        for row in reader:
+            rows.process(row)
+
+        bits, mask = geography.BITS, geography.MASK
+        geography.BITS, geography.MASK = 4, 15
+        try:
+            batched = self.metric()
+            for batch in reader.iter_columns(100):
+                batched.process_batch(batch)
+        finally:
+            geography.BITS, geography.MASK = bits, mask
+
+        self.assertGreater(len(batched.names), 16)
+        self.assertEqual(rows.get_value(), batched.get_value())
+
+    def test_merge(self):
+        """
+        Check merged shards with different intern tables give the same counts
+        """
+        reader = M3Reader(self.fixture)
+        serial = self.metric()
+        serial.process_batch(reader.to_columns())
+
+        merged = self.metric()
+        for rows in (reader[700:], reader[:700]):
+            metric = self.metric()
+            for row in rows:
+                metric.process(row)
+            merged.merge(metric)
+
+        self.assertEqual(serial.get_value(), merged.get_value())
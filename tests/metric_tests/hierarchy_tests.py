@@ -0,0 +1,107 @@
+# tests.metric_tests.hierarchy_tests
+# Tests for the domain hierarchy metric and the suffix trie
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Thu Jan 16 10:14:45 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: hierarchy_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the domain hierarchy metric and the suffix trie
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import unittest
+
+from mailstat.reader import *
+from mailstat.metric.hierarchy import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class SuffixTrieTests(unittest.TestCase):
+
+    def test_split(self):
+        """
+        Check domains are split at the longest public suffix
+        """
+        cases = {
+            u'gmail.com': (u'com', u'gmail.com', u'gmail'),
+            u'mail.yahoo.co.in': (u'in', u'yahoo.co.in', u'yahoo'),
+            u'Mail.GMAIL.co': (u'co', u'gmail.co', u'gmail'),
+            u'cs.umd.edu': (u'edu', u'umd.edu', u'umd'),
+            u'example.unknown': (u'unknown', u'example.unknown', u'example'),
+            u'co.uk': (u'uk', u'co.uk', u'co.uk'),
+        }
+        for domain, parts in cases.items():
+            self.assertEqual(parts, PUBLIC_SUFFIXES.split(domain))
+
+    def test_wildcards(self):
+        """
+        Check wildcard and exception rules
+        """
+        trie = SuffixTrie([u'ck', u'*.ck', u'!www.ck'])
+        self.assertEqual((u'ck', u'shop.foo.ck', u'shop'), trie.split(u'mail.shop.foo.ck'))
+        self.assertEqual((u'ck', u'www.ck', u'www'), trie.split(u'mail.www.ck'))
+
+    def test_memo(self):
+        """
+        Assert the memo is bounded and returns the same splits
+        """
+        trie = SuffixTrie([u'co.uk'], memo=4)
+        for idx in xrange(10):
+            self.assertEqual(trie.split(u'd%i.co.uk' % idx), trie(u'd%i.co.uk' % idx))
+            self.assertLessEqual(len(trie._recent) + len(trie._older), 4)
+
+class DomainHierarchyTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.fixture = os.path.join(tdir, "../fixtures/emailmetrics.csv")
+
+    def test_rollups(self):
+        """
+        Check batches and rows roll up to the same hierarchy
+        """
+        reader  = M3Reader(self.fixture)
+        batched = DomainHierarchy()
+        batched.preprocess()
+        for batch in reader.iter_columns(300):
+            batched.process_batch(batch)
+
+        rows = DomainHierarchy()
+        rows.preprocess()
+        for row in reader:
+            rows.process(row)
+
+        value = batched.get_value()
+        self.assertEqual(rows.get_value(), value)
+        for level in LEVELS:
+            self.assertEqual(len(reader), sum(value[level].values()))
+
+    def test_merge(self):
+        """
+        Check merged shards give the same hierarchy
+        """
+        reader = M3Reader(self.fixture)
+        merged = DomainHierarchy()
+        merged.preprocess()
+        for start, end in reader.shards(3):
+            metric = DomainHierarchy()
+            metric.preprocess()
+            for row in reader.iter_range(start, end):
+                metric.process(row)
+            merged.merge(metric)
+
+        serial = DomainHierarchy()
+        serial.preprocess()
+        serial.process_batch(reader.to_columns())
+        self.assertEqual(serial.get_value(), merged.get_value())
@@ -0,0 +1,97 @@
+# tests.metric_tests.identity_tests
+# Tests for the identity resolution metric
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Fri Jan 17 11:40:15 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: identity_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the identity resolution metric
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import unittest
+
+from mailstat.reader import *
+from mailstat.metric.identity import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class IdentityResolutionTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.fixture = os.path.join(tdir, "../fixtures/emailmetrics.csv")
+
+    def resolve(self, records, **kwargs):
+        metric = IdentityResolution(**kwargs)
+        metric.preprocess()
+        for record in records:
+            metric.add(*record)
+        metric.postprocess()
+        return metric.get_value()
+
+    def test_normalization(self):
+        """
+        Check names and local parts are normalized
+        """
+        self.assertEqual((u'jose', u'garcia'), parse_name(u'Jos\xe9', u'Garc\xeda Jr.', u''))
+        self.assertEqual((u'ada', u'lovelace'), parse_name(u'', u'', u'Lovelace, Ada'))
+        self.assertEqual((u'ada', u'lovelace'), parse_name(u'', u'', u'Ada King Lovelace'))
+        self.assertEqual((u'', u''), parse_name(u'', u'', u'ada@example.com'))
+        self.assertEqual(u'johnsmith', local_part(u'John.Smith+news42@example.com'))
+
+    def test_clusters(self):
+        """
+        Check addresses are linked by names, handles and local parts, but
+        not by handles (smithj) that could belong to several people
+        """
+        clusters = self.resolve([
+            (u'jsmith@work.com', u'John', u'Smith', u''),
+            (u'johnny.smith@home.net', u'Johnny', u'Smith', u''),
+            (u'johnnysmith@school.edu', u'', u'', u''),
+            (u'smithj@school.edu', u'', u'', u''),
+            (u'jane.smith@home.net', u'Jane', u'Smith', u''),
+            (u'jane.smith@work.com', u'', u'', u''),
+            (u'info@work.com', u'', u'', u''),
+            (u'info@home.net', u'', u'', u''),
+        ])
+
+        self.assertEqual([
+            [u'johnny.smith@home.net', u'johnnysmith@school.edu', u'jsmith@work.com'],
+            [u'jane.smith@home.net', u'jane.smith@work.com'],
+        ], clusters)
+
+    def test_rows_batches_and_merge(self):
+        """
+        Assert rows, batches and merged shards give the same clusters
+        """
+        reader  = M3Reader(self.fixture)
+        batched = IdentityResolution()
+        batched.preprocess()
+        for batch in reader.iter_columns(400):
+            batched.process_batch(batch)
+        batched.postprocess()
+
+        merged = IdentityResolution()
+        merged.preprocess()
+        for rows in (reader[:600], reader[600:]):
+            metric = IdentityResolution()
+            metric.preprocess()
+            for row in rows:
+                metric.process(row)
+            merged.merge(metric)
+        merged.postprocess()
+
+        self.assertTrue(batched.get_value())
+        self.assertEqual(batched.get_value(), merged.get_value())
@@ -0,0 +1,130 @@
+# tests.metric_tests.quantiles_tests
+# Tests for the count quantiles metric
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Wed Jan 15 10:41:06 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: quantiles_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the count quantiles metric
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import unittest
+import numpy as np
+
+from collections import Counter
+
+from mailstat.reader import *
+from mailstat.metric.quantiles import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class CountQuantilesTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.fixture = os.path.join(tdir, "../fixtures/emailmetrics.csv")
+        self.counts  = np.array([row[COUNT] for row in M3Reader(self.fixture) if row[COUNT]])
+
+    def metric(self, **kwargs):
+        metric = CountQuantiles(**kwargs)
+        metric.preprocess()
+        return metric
+
+    def test_quantiles(self):
+        """
+        Check the quantiles of the counts are close to the exact ones
+        """
+        metric = self.metric()
+        for batch in M3Reader(self.fixture).iter_columns(100):
+            metric.process_batch(batch)
+
+        value = metric.get_value()
+        self.assertEqual(len(self.counts), value['count'])
+        for key, q in (('p50', 50), ('p90', 90), ('p99', 99)):
+            exact = np.percentile(self.counts, q)
+            self.assertLessEqual(abs(value[key] - exact), max(1, 0.05 * exact))
+
+    def test_rows_and_merge(self):
+        """
+        Check merged row shards give the same counts as a batch
+        """
+        reader  = M3Reader(self.fixture)
+        batched = self.metric(domains=True)
+        batched.process_batch(reader.to_columns())
+
+        merged  = self.metric(domains=True)
+        for rows in (reader[:500], reader[500:]):
+            metric = self.metric(domains=True)
+            for row in rows:
+                metric.process(row)
+            merged.merge(metric)
+
+        expected = batched.get_value()
+        value    = merged.get_value()
+        self.assertEqual(expected['count'], value['count'])
+        self.assertEqual(
+            dict((d, v['count']) for d, v in expected['domains'].items()),
+            dict((d, v['count']) for d, v in value['domains'].items()),
+        )
+
+    def test_bounded_domains(self):
+        """
+        Assert domains beyond the maximum are summarized as other
+        """
+        metric = self.metric(domains=True, max_domains=5)
+        metric.process_batch(M3Reader(self.fixture).to_columns())
+
+        domains = metric.get_value()['domains']
+        self.assertEqual(6, len(domains))
+        self.assertIn(OTHER, domains)
+        self.assertEqual(len(self.counts), sum(v['count'] for v in domains.values()))
+
+    def test_heavy_hitter_domains(self):
+        """
+        Assert the largest domains are tracked, serially or merged
+        """
+        reader  = M3Reader(self.fixture)
+        sizes   = Counter(row[EMAIL].split('@')[1] for row in reader if row[COUNT])
+        fifth   = sorted(sizes.values(), reverse=True)[4]
+
+        serial  = self.metric(domains=True, max_domains=5)
+        for batch in reader.iter_columns(100):
+            serial.process_batch(batch)
+
+        # Every shard is non-empty and tracks domains the merge evicts
+        merged  = self.metric(domains=True, max_domains=5)
+        shards  = []
+        for rows in (reader[:500], reader[500:1000], reader[1000:]):
+            metric = self.metric(domains=True, max_domains=5)
+            for row in rows:
+                metric.process(row)
+            self.assertTrue(rows)
+            shards.append(metric)
+            merged.merge(metric)
+
+        tracked = set().union(*(shard.digests for shard in shards))
+        self.assertTrue(tracked - set(merged.digests))
+        self.assertGreater(
+            merged.digests[OTHER].count, sum(shard.digests[OTHER].count for shard in shards)
+        )
+
+        # Any of the domains tied for the fifth largest may be tracked
+        for metric in (serial, merged):
+            domains = metric.get_value()['domains']
+            tracked = set(domains) - set([OTHER])
+            self.assertEqual(5, len(tracked))
+            self.assertTrue(all(sizes[domain] >= fifth for domain in tracked))
+            self.assertTrue(set(d for d, size in sizes.items() if size > fifth) <= tracked)
+            self.assertEqual(len(self.counts), sum(v['count'] for v in domains.values()))
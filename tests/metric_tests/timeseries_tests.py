@@ -0,0 +1,141 @@
+# tests.metric_tests.timeseries_tests
+# Tests for the time series metric
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Tue Jan 14 11:18:27 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: timeseries_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the time series metric
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import unittest
+import numpy as np
+
+from datetime import datetime
+from collections import Counter
+from mailstat.exceptions import *
+from mailstat.reader import *
+from mailstat.metric.timeseries import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class TimeSeriesTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.fixture = os.path.join(tdir, "../fixtures/emailmetrics.csv")
+
+    def test_bins(self):
+        """
+        Check the binning and labels of every granularity
+        """
+        stamps = np.array([datetime(2013, 12, 29, 23, 45), datetime(2013, 12, 30, 1), None],
+                          dtype='datetime64[s]')
+        labels = lambda gran: [bin_label(v, gran) for v in bin_timestamps(stamps, gran)]
+
+        self.assertEqual(['2013-12-29', '2013-12-30'], labels('day'))
+        self.assertEqual(['2013-12-23', '2013-12-30'], labels('week'))
+        self.assertEqual(['2013-12', '2013-12'], labels('month'))
+        self.assertEqual(['2013', '2013'], labels('year'))
+
+    def test_histograms(self):
+        """
+        Assert the histograms match counts of the rows
+        """
+        rows   = list(M3Reader(self.fixture))
+        metric = TimeSeries()
+        metric.preprocess()
+        for batch in M3Reader(self.fixture).iter_columns(250):
+            metric.process_batch(batch)
+
+        value  = metric.get_value()
+        months = Counter(r[LAST_SEEN].strftime("%Y-%m") for r in rows if r[LAST_SEEN])
+        days   = Counter(r[FIRST_SEEN].strftime("%Y-%m-%d") for r in rows if r[FIRST_SEEN])
+        self.assertEqual(dict(months), value[LAST_SEEN]['month'])
+        self.assertEqual(dict(days), value[FIRST_SEEN]['day'])
+        self.assertEqual(sum(days.values()), sum(value[FIRST_SEEN]['week'].values()))
+
+    def test_rows_and_merge(self):
+        """
+        Check rows and merged shards give the same histograms as batches
+        """
+        reader  = M3Reader(self.fixture)
+        batched = TimeSeries()
+        batched.preprocess()
+        batched.process_batch(reader.to_columns())
+
+        merged  = TimeSeries()
+        merged.preprocess()
+        for rows in (reader[:700], reader[700:]):
+            metric = TimeSeries()
+            metric.preprocess()
+            for row in rows:
+                metric.process(row)
+            merged.merge(metric)
+
+        self.assertEqual(batched.get_value(), merged.get_value())
+
+class ActiveCorrespondentsTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.fixture = os.path.join(tdir, "../fixtures/emailmetrics.csv")
+
+    def test_active_months(self):
+        """
+        Assert the sweep matches testing every interval against every month
+        """
+        rows   = list(M3Reader(self.fixture))
+        metric = ActiveCorrespondents('month')
+        metric.preprocess()
+        for batch in M3Reader(self.fixture).iter_columns(200):
+            metric.process_batch(batch)
+
+        value = metric.get_value()
+        for label, count in value.items():
+            expected = sum(
+                1 for row in rows if row[FIRST_SEEN] and
+                row[FIRST_SEEN].strftime("%Y-%m") <= label and
+                (row[LAST_SEEN] or row[FIRST_SEEN]).strftime("%Y-%m") >= label
+            )
+            self.assertEqual(expected, count, label)
+
+    def test_step_and_merge(self):
+        """
+        Check the step function of merged shards
+        """
+        merged = ActiveCorrespondents()
+        merged.preprocess()
+        for stamps in ([(datetime(2013, 1, 1), datetime(2013, 1, 3))],
+                       [(datetime(2013, 1, 2), datetime(2013, 1, 2)), (datetime(2013, 1, 5), None)]):
+            metric = ActiveCorrespondents()
+            metric.preprocess()
+            for first, last in stamps:
+                metric.process({FIRST_SEEN: first, LAST_SEEN: last})
+            merged.merge(metric)
+
+        times, counts = merged.step()
+        self.assertEqual([1, 2, 1, 0, 1, 0], counts.tolist())
+        self.assertEqual(
+            {'2013-01-01': 1, '2013-01-02': 2, '2013-01-03': 1, '2013-01-04': 0, '2013-01-05': 1},
+            merged.get_value()
+        )
+
+    def test_bad_granularity(self):
+        """
+        Assert unknown granularities are improperly configured
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            ActiveCorrespondents('hour')
@@ -0,0 +1,62 @@
+# tests.pipeline_tests
+# Tests for the producer/consumer pipeline
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Thu Jan 09 10:55:06 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: pipeline_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the producer/consumer pipeline
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import unittest
+
+from mailstat.pipeline import *
+
+##########################################################################
+## Helpers
+##########################################################################
+
+def failing(count):
+    for idx in xrange(count):
+        yield idx
+    raise ValueError("reader failed")
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class PipelineTests(unittest.TestCase):
+
+    def test_batches(self):
+        """
+        Assert all items are delivered in order and in batches
+        """
+        batches = list(Pipeline(xrange(2500), batch_size=1000, maxsize=1))
+        self.assertEqual([1000, 1000, 500], [len(b) for b in batches])
+        self.assertEqual(range(2500), [i for b in batches for i in b])
+
+    def test_exceptions(self):
+        """
+        Check that errors in the reader are raised in the consumer
+        """
+        with self.assertRaises(ValueError):
+            list(Pipeline(failing(25), batch_size=10))
+
+    def test_early_stop(self):
+        """
+        Check the reader is stopped when the consumer stops early
+        """
+        consumed = 0
+        for batch in Pipeline(xrange(100000), batch_size=10, maxsize=2):
+            consumed += len(batch)
+            if consumed >= 50: break
+        self.assertEqual(50, consumed)
@@ -18,10 +18,16 @@ Testing the M3Reader package for mailstat
 ##########################################################################
 
 import os
+import bz2
+import gzip
+import shutil
 import unittest
 import random
+import tempfile
+import numpy as np
 
 from mailstat.reader import *
+from mailstat.index import LineIndex
 from mailstat.exceptions import *
 from datetime import datetime
 
@@ -76,3 +82,204 @@ class ReaderTests(unittest.TestCase):
         self.assertFalse(hasattr(reader, '_lines'), "Pre-iter property set?")
         self.assertEqual(1430, len(reader), "Length doesn't match.")
         self.assertTrue(hasattr(reader, '_lines'), "Post-iter property set?")
+
+    def test_to_columns(self):
+        """
+        Check the columnar load mode of the reader
+        """
+        reader  = M3Reader(self.fixture)
+        columns = reader.to_columns()
+
+        self.assertEqual(set(FIELDS), set(columns.keys()))
+        for field in FIELDS:
+            self.assertEqual(1430, len(columns[field]))
+
+        self.assertEqual(columns[COUNT].dtype, np.int64)
+        self.assertEqual(columns[FIRST_SEEN].dtype, np.dtype('datetime64[s]'))
+        self.assertTrue(isinstance(columns[EMAIL], Categorical))
+
+    def test_columns_match_rows(self):
+        """
+        Assert the columnar data matches the row iteration
+        """
+        reader  = M3Reader(self.fixture)
+        columns = reader.to_columns()
+        for idx, row in enumerate(reader):
+            self.assertEqual(row[EMAIL], columns[EMAIL][idx])
+            self.assertEqual(row[COUNT], columns[COUNT][idx])
+            if row[LAST_SEEN]:
+                self.assertEqual(np.datetime64(row[LAST_SEEN], 's'), columns[LAST_SEEN][idx])
+            else:
+                self.assertTrue(np.isnat(columns[LAST_SEEN][idx]))
+
+    def test_iter_columns(self):
+        """
+        Check column oriented batches match the full columns
+        """
+        reader  = M3Reader(self.fixture, fields=(EMAIL, COUNT))
+        columns = reader.to_columns()
+        batches = list(reader.iter_columns(500))
+
+        self.assertEqual([500, 500, 430], [len(b[EMAIL]) for b in batches])
+        self.assertEqual(list(columns[EMAIL]), [e for b in batches for e in b[EMAIL]])
+        self.assertEqual(list(columns[COUNT]), [c for b in batches for c in b[COUNT]])
+
+        start, end = reader.shards(2)[1]
+        emails = [e for b in reader.iter_columns(500, start, end) for e in b[EMAIL]]
+        self.assertEqual([row[EMAIL] for row in reader.iter_range(start, end)], emails)
+
+    def test_shards(self):
+        """
+        Check that shards cover every row exactly once
+        """
+        reader = M3Reader(self.fixture)
+        shards = reader.shards(4)
+        self.assertEqual(4, len(shards))
+
+        emails = []
+        for start, end in shards:
+            emails.extend(row[EMAIL] for row in reader.iter_range(start, end))
+        self.assertEqual([row[EMAIL] for row in reader], emails)
+
+    def test_projection(self):
+        """
+        Assert the reader only munges the projected fields
+        """
+        reader = M3Reader(self.fixture)
+        subset = M3Reader(self.fixture, fields=(EMAIL, LAST_SEEN))
+        for row, other in zip(reader, subset):
+            self.assertEqual(set([EMAIL, LAST_SEEN]), set(other.keys()))
+            self.assertEqual(row[EMAIL], other[EMAIL])
+            self.assertEqual(row[LAST_SEEN], other[LAST_SEEN])
+
+        columns = subset.to_columns()
+        self.assertEqual(set([EMAIL, LAST_SEEN]), set(columns.keys()))
+
+    def test_bad_projection(self):
+        """
+        Check that projecting a missing field raises an exception
+        """
+        reader = M3Reader(self.fixture, fields=(EMAIL, "Favorite Color"))
+        with self.assertRaises(ReaderException):
+            list(reader)
+
+    def test_getitem(self):
+        """
+        Check random access and slicing of rows by index
+        """
+        reader = M3Reader(self.fixture)
+        rows   = list(reader)
+        for idx in (0, 1, 713, 1429, -1, -1430):
+            self.assertEqual(rows[idx], reader[idx])
+
+        self.assertEqual(rows[10:20], reader[10:20])
+        self.assertEqual(rows[1420:], reader[1420:])
+        self.assertEqual(rows[5:50:7], reader[5:50:7])
+        self.assertEqual([], reader[20:10])
+
+        with self.assertRaises(IndexError):
+            reader[1430]
+
+class CompressedReaderTests(unittest.TestCase):
+
+    def setUp(self):
+        tdir = os.path.dirname(__file__)
+        self.fixture = os.path.join(tdir, "fixtures/emailmetrics.csv")
+        self.tmpdir  = tempfile.mkdtemp(prefix="mailstat-")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def compress(self, name, opener):
+        path = os.path.join(self.tmpdir, name)
+        with open(self.fixture, 'rb') as data:
+            out = opener(path, 'wb')
+            out.write(data.read())
+            out.close()
+        return path
+
+    def assertReadsFixture(self, path, compression):
+        reader = M3Reader(path)
+        self.assertEqual(compression, reader.compression)
+        self.assertEqual(list(M3Reader(self.fixture)), list(reader))
+        self.assertEqual(1430, len(M3Reader(path)))
+        self.assertEqual(1430, len(reader.to_columns()[EMAIL]))
+
+    def test_gzip(self):
+        """
+        Check that gzip compressed files are streamed
+        """
+        self.assertReadsFixture(self.compress("emails.csv.gz", gzip.open), 'gzip')
+
+    def test_bz2(self):
+        """
+        Check that bz2 compressed files are streamed
+        """
+        self.assertReadsFixture(self.compress("emails.csv.bz2", bz2.BZ2File), 'bz2')
+
+    def test_magic_bytes(self):
+        """
+        Assert compression is detected without an extension
+        """
+        path = self.compress("emails.dat", gzip.open)
+        self.assertEqual('gzip', M3Reader(path).compression)
+        self.assertIsNone(M3Reader(self.fixture).compression)
+
+    def test_no_random_access(self):
+        """
+        Check byte offsets are refused on compressed files
+        """
+        reader = M3Reader(self.compress("emails.csv.gz", gzip.open))
+        with self.assertRaises(ReaderException):
+            reader.shards(2)
+        with self.assertRaises(ReaderException):
+            reader[10]
+
+class LineIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkstemp(suffix=".csv", prefix="email-")[1]
+        with open(self.path, 'wb') as data:
+            data.write("Email Address,Count\r\n")
+            data.write("a@gmail.com,1\r\n\r\n")
+            data.write("b@yahoo.com,2\r\n")
+            data.write("c@umd.edu,3")
+
+    def tearDown(self):
+        for path in (self.path, self.path + ".idx"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_build(self):
+        """
+        Assert blank lines and a missing final newline are handled
+        """
+        index = LineIndex.build(self.path)
+        self.assertEqual(3, len(index))
+        self.assertEqual([21, 38, 53, 64], list(index.offsets))
+
+    def test_sidecar(self):
+        """
+        Check the index is persisted and invalidated on change
+        """
+        index = LineIndex.open(self.path)
+        self.assertTrue(os.path.exists(self.path + ".idx"))
+        self.assertEqual(list(index.offsets), list(LineIndex.load(self.path).offsets))
+
+        with open(self.path, 'ab') as data:
+            data.write("\r\nd@ieee.org,4\r\n")
+        self.assertIsNone(LineIndex.load(self.path))
+        self.assertEqual(4, len(LineIndex.open(self.path)))
+
+class CategoricalTests(unittest.TestCase):
+
+    def test_from_values(self):
+        """
+        Test the encoding of strings into a Categorical
+        """
+        column = Categorical.from_values(['a', 'b', 'a', 'c', 'a'])
+        self.assertEqual(5, len(column))
+        self.assertEqual(3, len(column.categories))
+        self.assertEqual('c', column[3])
+        self.assertEqual(['a', 'b', 'a', 'c', 'a'], list(column.values()))
+        self.assertEqual(['b', 'a'], list(column[1:3]))
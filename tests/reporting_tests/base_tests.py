@@ -18,10 +18,12 @@ Test cases for the base Report class
 ##########################################################################
 
 import os
+import shutil
 import unittest
 import tempfile
 
-from jinja2 import Environment
+from jinja2 import Environment, ModuleLoader
+from mailstat.reporting import base
 from mailstat.reporting.base import *
 from mailstat.exceptions import *
 
@@ -94,3 +96,52 @@ class ReportTests(unittest.TestCase):
         self.assertIn('report', context)
         self.assertEqual(context['report'], report)
 
+
+class EnvironmentTests(unittest.TestCase):
+    """
+    Tests the shared, cached template environment
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+        # Isolate the shared environment from the user's bytecode cache
+        self.environment  = base._environment
+        base._environment = create_environment(cachedir=os.path.join(self.tmpdir, "shared"))
+
+    def tearDown(self):
+        base._environment = self.environment
+        shutil.rmtree(self.tmpdir)
+
+    def test_shared_environment(self):
+        """
+        Assert all reports share one environment and compiled templates
+        """
+        first, second = Report(template_name='base.html'), Report(template_name='base.html')
+        self.assertIs(first.environment, second.environment)
+        self.assertIs(first.get_template(), second.get_template())
+
+    def test_bytecode_cache(self):
+        """
+        Check compiled template bytecode is cached on disk
+        """
+        cachedir    = os.path.join(self.tmpdir, "bytecode")
+        environment = create_environment(cachedir=cachedir, compiled=None)
+        environment.get_template('base.html')
+        self.assertTrue(os.listdir(cachedir))
+
+        # A new environment (e.g. in another process) loads the bytecode
+        template = create_environment(cachedir=cachedir, compiled=None).get_template('base.html')
+        self.assertIn("Cached", template.render(title="Cached"))
+
+    def test_precompiled_templates(self):
+        """
+        Check precompiled templates are loaded as modules
+        """
+        compiled    = compile_templates(os.path.join(self.tmpdir, "compiled"))
+        environment = create_environment(cachedir=None, compiled=compiled)
+        self.assertIsInstance(environment.loader.loaders[0], ModuleLoader)
+
+        template = environment.get_template('base.html')
+        self.assertTrue(template.module.__name__)
+        self.assertIn("Compiled", template.render(title="Compiled"))
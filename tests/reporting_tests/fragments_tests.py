@@ -0,0 +1,121 @@
+# tests.reporting_tests.fragments_tests
+# Test cases for the incremental rendering of report sections
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Mon Jan 27 11:20:03 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: fragments_tests.py [] benjamin@bengfort.com $
+
+"""
+Test cases for the incremental rendering of report sections
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import shutil
+import unittest
+import tempfile
+
+from mailstat.reporting.fragments import *
+from mailstat.reporting.writers import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class FragmentCacheTests(unittest.TestCase):
+    """
+    Tests the fragment cache and incremental reports
+    """
+
+    def setUp(self):
+        self.tmpdir    = tempfile.mkdtemp()
+        self.fragments = FragmentCache(os.path.join(self.tmpdir, "fragments"))
+        self.path      = os.path.join(self.tmpdir, "report.html")
+        self.values    = {
+            "Domain Distribution": {u"gmail.com": 3, u"b\xfccher.de": 2},
+            "Distinct Domains": {"estimate": 2, "error": 0.01},
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def render(self, values):
+        write_html(values, self.path, fragments=self.fragments, generated="now")
+        with open(self.path) as data:
+            return data.read().decode('utf8')
+
+    def test_cache(self):
+        """
+        Check fragments are stored, fetched and cleared
+        """
+        key = self.fragments.key("a", "b")
+        self.assertIsNone(self.fragments.get(key))
+        self.fragments.set(key, u"<p>b\xfccher</p>")
+        self.assertEqual(u"<p>b\xfccher</p>", self.fragments.get(key))
+        self.assertEqual((1, 1), (self.fragments.hits, self.fragments.misses))
+
+        self.fragments.clear()
+        self.assertIsNone(self.fragments.get(key))
+
+    def test_digests(self):
+        """
+        Assert value digests change with the values
+        """
+        value = self.values["Domain Distribution"]
+        self.assertEqual(value_digest(value), value_digest(dict(value)))
+        self.assertNotEqual(value_digest(value), value_digest({u"gmail.com": 4}))
+
+    def test_incremental_report(self):
+        """
+        Check only the sections of changed values are rendered again
+        """
+        full = self.render(self.values)
+        self.assertEqual((0, 2), (self.fragments.hits, self.fragments.misses))
+
+        self.assertEqual(full, self.render(self.values))
+        self.assertEqual((2, 2), (self.fragments.hits, self.fragments.misses))
+
+        self.values["Distinct Domains"]["estimate"] = 3
+        html = self.render(self.values)
+        self.assertEqual((3, 3), (self.fragments.hits, self.fragments.misses))
+        self.assertEqual(2, html.count(u"<section"))
+        self.assertIn(u"b\xfccher.de", html)
+
+    def test_prune_unused(self):
+        """
+        Assert fragments no report uses any more are deleted
+        """
+        cached = lambda: len([name for name in os.listdir(self.fragments.cachedir) if name.endswith(".html")])
+
+        for estimate in xrange(3, 8):
+            self.values["Distinct Domains"]["estimate"] = estimate
+            self.render(self.values)
+            self.assertEqual(2, cached())
+
+        # Fragments of another report are kept
+        other = os.path.join(self.tmpdir, "other.html")
+        write_html({"Distinct Domains": {"estimate": 1}}, other, fragments=self.fragments)
+        self.assertEqual(3, cached())
+
+        self.values["Distinct Domains"]["estimate"] = 2
+        self.render(self.values)
+        self.assertEqual(3, cached())
+        self.assertEqual(0, self.fragments.prune())
+
+    def test_matches_full_render(self):
+        """
+        Assert assembled sections match the sections of a full render
+        """
+        write_html(self.values, self.path, generated="now")
+        with open(self.path) as data:
+            full = data.read().decode('utf8')
+
+        normalize = lambda html: [line.strip() for line in html.splitlines() if line.strip()]
+        self.assertEqual(normalize(full), normalize(self.render(self.values)))
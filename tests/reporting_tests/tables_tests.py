@@ -0,0 +1,104 @@
+# tests.reporting_tests.tables_tests
+# Test cases for the streaming, paginated table reports
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Wed Jan 22 11:05:52 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: tables_tests.py [] benjamin@bengfort.com $
+
+"""
+Test cases for the streaming, paginated table reports
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import shutil
+import unittest
+import tempfile
+
+from mailstat.reporting.tables import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class TableReportTests(unittest.TestCase):
+    """
+    Tests the table report class
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path   = os.path.join(self.tmpdir, "domains.html")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read(self, path):
+        with open(path) as data:
+            return data.read().decode('utf8')
+
+    def domains(self, count):
+        for idx in xrange(count):
+            yield u"d%i.example.com" % idx, idx
+
+    def test_single_page(self):
+        """
+        Check a generator is streamed into a single table
+        """
+        report = TableReport(title="Domains", columns=("Domain", "Count"), rows=self.domains(50))
+        self.assertEqual([self.path], report.render(self.path))
+
+        html = self.read(self.path)
+        self.assertEqual(50, html.count(u"<tr><td>"))
+        self.assertIn(u"d49.example.com", html)
+        self.assertNotIn(u"pager", html)
+
+    def test_pagination(self):
+        """
+        Assert rows are split across pages with an index and links
+        """
+        report = TableReport(title="Domains", columns=("Domain", "Count"), page_size=10)
+        paths  = report.render(self.path, rows=self.domains(25))
+        self.assertEqual(["domains.html", "domains-1.html", "domains-2.html", "domains-3.html"],
+                         [os.path.basename(path) for path in paths])
+
+        pages = [self.read(path) for path in paths[1:]]
+        self.assertEqual([10, 10, 5], [page.count(u"<tr><td>") for page in pages])
+        self.assertIn(u'href="domains-2.html"', pages[0])
+        self.assertNotIn(u'href="domains-4.html"', pages[2])
+        self.assertIn(u'href="domains-2.html"', pages[2])
+
+        index = self.read(self.path)
+        self.assertIn(u"25 rows on 3 pages", index)
+        self.assertIn(u"rows 21 to 25", index)
+
+    def test_lazy_rows(self):
+        """
+        Check the rows are consumed one page (plus one row) at a time
+        """
+        consumed = []
+        def rows():
+            for row in self.domains(30):
+                consumed.append(row)
+                yield row
+
+        report = TableReport(columns=("Domain", "Count"), page_size=10)
+        pager  = Pager(rows(), 10, self.path)
+        page   = Page(pager, 1)
+        report.stream(report.get_template(), os.path.join(self.tmpdir, "page.html"), page=page)
+        self.assertEqual(11, len(consumed))
+
+    def test_escaping(self):
+        """
+        Assert cells are HTML escaped
+        """
+        report = TableReport(columns=("Name",), rows=[(u"<script>",)])
+        report.render(self.path)
+        self.assertIn(u"&lt;script&gt;", self.read(self.path))
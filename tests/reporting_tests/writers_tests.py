@@ -0,0 +1,160 @@
+# tests.reporting_tests.writers_tests
+# Test cases for the multi-format analysis writers
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Thu Jan 23 11:27:40 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: writers_tests.py [] benjamin@bengfort.com $
+
+"""
+Test cases for the multi-format analysis writers
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import json
+import shutil
+import unittest
+import tempfile
+import numpy as np
+import unicodecsv as csv
+
+from mailstat.analyze import Analysis
+from mailstat.exceptions import *
+from mailstat.reporting.writers import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class WritersTests(unittest.TestCase):
+    """
+    Tests the analysis writers
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.values = {
+            "Domain Distribution": {u"gmail.com": 3, u"b\xfccher.de": np.int64(2)},
+            "Top": [{"email": u"a@gmail.com", "count": 3}],
+            "Quantiles": {"p50": np.float64(1.5), "p99": None},
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_flatten(self):
+        """
+        Check nested values are flattened to paths of scalars
+        """
+        self.assertEqual(
+            [(("a", 0, "b"), 1), (("a", 1, "b"), 2), (("c",), 3)],
+            list(flatten({"c": 3, "a": [{"b": 1}, {"b": 2}]}))
+        )
+
+    def test_output_paths(self):
+        """
+        Assert output paths are named for their formats
+        """
+        self.assertEqual({'html': "out.html"}, output_paths("out.html", ["html"]))
+        self.assertEqual({'html': "out.html", 'csv': "out.csv"}, output_paths("out.html", ["html", "csv"]))
+        with self.assertRaises(ImproperlyConfigured):
+            output_paths("out", ["pdf"])
+
+    def test_write_all(self):
+        """
+        Check every format is written from the same values
+        """
+        paths = output_paths(os.path.join(self.tmpdir, "report"), ["html", "json", "csv", "npz"])
+        write_all(self.values, paths, source="emails.csv")
+
+        with open(paths['json']) as data:
+            self.assertEqual(2, json.load(data)["Domain Distribution"][u"b\xfccher.de"])
+
+        with open(paths['csv'], 'rb') as data:
+            rows = list(csv.reader(data, encoding='utf8'))
+        self.assertIn([u"Top", u"0/email", u"a@gmail.com"], rows)
+
+        with open(paths['html']) as data:
+            html = data.read().decode('utf8')
+        self.assertEqual(3, html.count(u"<section"))
+        self.assertIn(u"b\xfccher.de", html)
+
+        columns = np.load(paths['npz'])
+        self.assertEqual([u"b\xfccher.de", u"gmail.com"], columns["Domain Distribution/keys"].tolist())
+        self.assertEqual([2.0, 3.0], columns["Domain Distribution/values"].tolist())
+        self.assertEqual([u"3", u"a@gmail.com"], columns["Top/values"].tolist())
+
+    def test_streaming_json(self):
+        """
+        Check JSON is compact and streamed from (name, value) pairs
+        """
+        path  = os.path.join(self.tmpdir, "report.json")
+        pairs = ((name, value) for name, value in sorted(self.values.items()))
+        write_all(pairs, {'json': path})
+
+        with open(path) as data:
+            text = data.read()
+        self.assertNotIn(": ", text)
+        self.assertNotIn("\n", text)
+        self.assertEqual(
+            {u"p50": 1.5, u"p99": None}, json.loads(text)["Quantiles"]
+        )
+
+    def test_msgpack(self):
+        """
+        Assert MessagePack requires the optional msgpack package
+        """
+        path = os.path.join(self.tmpdir, "report.msgpack")
+        if msgpack is None:
+            with self.assertRaises(ImproperlyConfigured):
+                output_paths(path, ["msgpack"])
+            with self.assertRaises(ImproperlyConfigured):
+                write_msgpack(self.values, path)
+            return
+
+        self.assertEqual({'msgpack': path}, output_paths(path, ["msgpack"]))
+        write_msgpack(self.values, path)
+        with open(path, 'rb') as data:
+            values = msgpack.unpack(data, raw=False)
+        self.assertEqual(2, values[u"Domain Distribution"][u"b\xfccher.de"])
+
+    def test_analysis_report(self):
+        """
+        Assert the analysis of the fixture renders a section per metric
+        """
+        fixture  = os.path.join(os.path.dirname(__file__), "../fixtures/emailmetrics.csv")
+        analysis = Analysis(fixture)
+        analysis.analyze()
+
+        path = os.path.join(self.tmpdir, "report.html")
+        write_html(analysis.serialize(), path)
+        with open(path) as data:
+            html = data.read().decode('utf8')
+        self.assertEqual(len(analysis.metrics), html.count(u"<section"))
+
+    def test_large_tables(self):
+        """
+        Check large flat mappings are linked to paginated tables
+        """
+        path   = os.path.join(self.tmpdir, "report.html")
+        days   = dict((u"2013-01-%03i" % day, day) for day in xrange(250))
+        values = {"Time Series": {"First Seen": {"day": days, "year": {u"2013": 250}}}}
+        AnalysisReport(values=values, table_size=100, page_size=100).render(path)
+
+        with open(path) as data:
+            html = data.read().decode('utf8')
+        self.assertIn(u'<a href="report-time-series-first-seen-day.html">250 rows</a>', html)
+        self.assertNotIn(u"2013-01-007", html)
+        self.assertIn(u"2013", html)
+
+        with open(os.path.join(self.tmpdir, "report-time-series-first-seen-day-3.html")) as data:
+            page = data.read().decode('utf8')
+        self.assertIn(u"2013-01-249", page)
+        self.assertNotIn(u"2013-01-199", page)
@@ -0,0 +1,99 @@
+# tests.utils_tests.dates_tests
+# Tests for the fast timestamp parser
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Mon Jan 06 10:02:45 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: dates_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the fast timestamp parser
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import random
+import unittest
+
+from datetime import datetime, timedelta
+from mailstat.utils.dates import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class DateParserTests(unittest.TestCase):
+
+    def assertParsesLikeStrptime(self, fmt, values):
+        parser = DateParser(fmt)
+        self.assertTrue(parser.compiled, "'%s' not compiled" % fmt)
+        for value in values:
+            self.assertEqual(datetime.strptime(value, fmt), parser(value))
+            self.assertEqual(datetime.strptime(value, fmt), parser.parse(value))
+
+    def test_default_format(self):
+        """
+        Check the default MineMyMail format against strptime
+        """
+        self.assertParsesLikeStrptime('%m/%d/%Y %H:%M:%S %p', (
+            '12/25/2011 02:29:44 PM', '1/16/2013 04:20:16 PM',
+            '07/29/2013 12:50:22 am', '2/3/2009 1:2:3 AM',
+        ))
+
+    def test_common_formats(self):
+        """
+        Check other common formats against strptime
+        """
+        self.assertParsesLikeStrptime('%m/%d/%Y %I:%M:%S %p', (
+            '12/25/2011 02:29:44 PM', '12/25/2011 12:29:44 AM',
+            '12/25/2011 12:29:44 PM',
+        ))
+        self.assertParsesLikeStrptime('%Y-%m-%d %H:%M:%S', (
+            '2013-12-29 23:45:58', '2013-01-02 00:00:00',
+        ))
+        self.assertParsesLikeStrptime('%Y-%m-%dT%H:%M:%S.%f', (
+            '2013-12-29T23:45:58.123', '2013-12-29T23:45:58.123456',
+        ))
+        self.assertParsesLikeStrptime('%d/%m/%y', ('29/12/13', '01/02/69'))
+
+    def test_random_timestamps(self):
+        """
+        Check random timestamps of several formats against strptime
+        """
+        rand   = random.Random(42)
+        start  = datetime(1970, 1, 1)
+        stamps = [start + timedelta(seconds=rand.randint(0, 2**31)) for _ in xrange(2000)]
+        for fmt in ('%Y-%m-%d %I:%M:%S', '%Y-%m-%d %I:%M:%S %p', '%m/%d/%y %H:%M:%S %p'):
+            self.assertParsesLikeStrptime(fmt, [stamp.strftime(fmt) for stamp in stamps])
+
+    def test_fallback(self):
+        """
+        Assert unknown formats fall back to strptime
+        """
+        parser = DateParser('%d %b %Y')
+        self.assertFalse(parser.compiled)
+        self.assertEqual(datetime(2013, 12, 29), parser('29 Dec 2013'))
+
+    def test_invalid(self):
+        """
+        Check that invalid timestamps raise ValueError
+        """
+        parser = DateParser('%m/%d/%Y %H:%M:%S %p')
+        for value in ('13/25/2011 02:29:44 PM', '02/30/2011 02:29:44 PM', 'foo'):
+            with self.assertRaises(ValueError):
+                parser(value)
+
+    def test_memo_is_bounded(self):
+        """
+        Assert the memo never holds more than its size
+        """
+        parser = DateParser('%Y-%m-%d', memo=10)
+        for day in xrange(1, 29):
+            parser('2013-02-%02i' % day)
+            self.assertLessEqual(len(parser._recent) + len(parser._older), 10)
+        self.assertEqual(datetime(2013, 2, 28), parser('2013-02-28'))
@@ -0,0 +1,157 @@
+# tests.utils_tests.sketches_tests
+# Tests for the probabilistic sketches
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Mon Jan 13 13:02:51 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: sketches_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the probabilistic sketches
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import unittest
+import numpy as np
+
+from mailstat.exceptions import *
+from mailstat.utils.sketches import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class HashingTests(unittest.TestCase):
+
+    def test_hash64(self):
+        """
+        Check hashes are stable and the same for bytes and unicode
+        """
+        hashes = hash64([u'a@gmail.com', 'a@gmail.com', u'b@gmail.com'])
+        self.assertEqual(np.uint64, hashes.dtype)
+        self.assertEqual(hashes[0], hashes[1])
+        self.assertNotEqual(hashes[0], hashes[2])
+
+    def test_bit_length(self):
+        """
+        Assert the vectorized bit length matches int.bit_length
+        """
+        values = [0, 1, 2, 3, 255, 256, 2**32 - 1, 2**32, 2**53 - 1, 2**63 + 5, 2**64 - 1]
+        array  = np.array(values, dtype=np.uint64)
+        self.assertEqual([v.bit_length() for v in values], list(bit_length(array)))
+
+class HyperLogLogTests(unittest.TestCase):
+
+    def test_estimate(self):
+        """
+        Check the estimate is within three standard errors
+        """
+        for count in (100, 5000, 200000):
+            sketch = HyperLogLog(12)
+            values = ["user%i@example.com" % idx for idx in xrange(count)]
+            sketch.add(values)
+            sketch.add(values[:count // 2])
+            self.assertLess(abs(sketch.estimate() - count), 3 * sketch.error * count)
+
+    def test_merge(self):
+        """
+        Assert merged sketches equal the sketch of the union
+        """
+        union, left, right = HyperLogLog(10), HyperLogLog(10), HyperLogLog(10)
+        values = ["%i" % idx for idx in xrange(10000)]
+        union.add(values)
+        left.add(values[:6000])
+        right.add(values[4000:])
+
+        left.merge(right)
+        self.assertTrue(np.array_equal(union.registers, left.registers))
+
+        with self.assertRaises(ImproperlyConfigured):
+            left.merge(HyperLogLog(11))
+
+class CountMinSketchTests(unittest.TestCase):
+
+    def test_never_undercounts(self):
+        """
+        Check estimates are at least the true counts and close to them
+        """
+        sketch = CountMinSketch(width=16384, depth=4)
+        values = ["domain%i.com" % idx for idx in xrange(2000)]
+        counts = np.arange(1, 2001)
+        sketch.add(values, counts)
+        sketch.add(values[:10])
+
+        estimates = sketch.query(values)
+        truth     = counts + np.array([1] * 10 + [0] * 1990)
+        self.assertTrue(np.all(estimates >= truth))
+        self.assertEqual(sketch.total, truth.sum())
+
+        # The heaviest values have a small relative error
+        self.assertLess(np.max((estimates - truth)[-10:] / truth[-10:].astype(float)), 0.5)
+
+        # Updates return the estimates after adding
+        self.assertEqual((estimates[:2] + 1).tolist(), sketch.update(values[:2]).tolist())
+        self.assertEqual([], sketch.update([]).tolist())
+
+    def test_merge(self):
+        """
+        Assert merged sketches equal the sketch of both streams
+        """
+        both, left, right = [CountMinSketch(256, 3) for idx in xrange(3)]
+        both.add(["a", "b", "c"], [1, 2, 3])
+        both.add(["c", "d"], [4, 5])
+        left.add(["a", "b", "c"], [1, 2, 3])
+        right.add(["c", "d"], [4, 5])
+
+        left.merge(right)
+        self.assertTrue(np.array_equal(both.table, left.table))
+        self.assertEqual(15, left.total)
+
+        with self.assertRaises(ImproperlyConfigured):
+            left.merge(CountMinSketch(256, 4))
+
+class TDigestTests(unittest.TestCase):
+
+    def test_quantiles(self):
+        """
+        Check T-Digest quantiles are close to the exact quantiles
+        """
+        values = np.random.RandomState(42).lognormal(size=100000)
+        digest = TDigest(100)
+        for chunk in np.array_split(values, 37):
+            digest.add(chunk)
+
+        self.assertEqual(100000, digest.count)
+        self.assertLessEqual(digest.size, 210)
+        for q in (0.01, 0.5, 0.9, 0.99):
+            exact = np.percentile(values, q * 100)
+            self.assertLess(abs(digest.quantile(q) - exact) / exact, 0.02)
+
+    def test_merge(self):
+        """
+        Check merged digests estimate the quantiles of the union
+        """
+        random  = np.random.RandomState(7)
+        values  = np.r_[random.exponential(size=50000), random.exponential(10, size=50000)]
+        digests = [TDigest(100), TDigest(100)]
+        digests[0].add(values[:50000])
+        digests[1].add(values[50000:])
+        digests[0].merge(digests[1])
+
+        self.assertEqual(100000, digests[0].count)
+        for q in (0.5, 0.9, 0.99):
+            exact = np.percentile(values, q * 100)
+            self.assertLess(abs(digests[0].quantile(q) - exact) / exact, 0.03)
+
+    def test_bad_compression(self):
+        """
+        Assert small compressions are improperly configured
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            TDigest(2)
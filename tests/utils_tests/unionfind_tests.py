@@ -0,0 +1,55 @@
+# tests.utils_tests.unionfind_tests
+# Tests for the union-find disjoint set forest
+#
+# Author:   Benjamin Bengfort <benjamin@bengfort.com>
+# Created:  Fri Jan 17 11:02:37 2014 -0500
+#
+# Copyright (C) 2013 Bengfort.com
+# For license information, see LICENSE.txt
+#
+# ID: unionfind_tests.py [] benjamin@bengfort.com $
+
+"""
+Tests for the union-find disjoint set forest
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import unittest
+
+from mailstat.utils.unionfind import *
+
+##########################################################################
+## TestCase
+##########################################################################
+
+class UnionFindTests(unittest.TestCase):
+
+    def test_union(self):
+        """
+        Check unions join sets and report if they were already joined
+        """
+        forest = UnionFind('abcde')
+        self.assertEqual(5, len(forest))
+        self.assertTrue(forest.union('a', 'b'))
+        self.assertTrue(forest.union('c', 'b'))
+        self.assertFalse(forest.union('a', 'c'))
+
+        self.assertTrue(forest.connected('a', 'c'))
+        self.assertFalse(forest.connected('a', 'd'))
+        self.assertEqual(3, len(forest))
+
+    def test_sets(self):
+        """
+        Assert sets contain every item exactly once
+        """
+        forest = UnionFind()
+        for idx in xrange(100):
+            forest.union(idx, idx % 7)
+
+        sets = sorted(sorted(items) for items in forest.sets())
+        self.assertEqual(7, len(sets))
+        self.assertEqual(range(100), sorted(sum(sets, [])))
+        self.assertEqual(range(0, 100, 7), sets[0])